@@ -1,58 +1,93 @@
-import pandas as pd
-
-county_fips_df = pd.read_csv('county_fips.csv')
-
-county_fips_df[['GeoFIPS', 'Region']] = county_fips_df['GeoFIPS      Region'].str.split(' ', n=1, expand=True)
-
-county_fips_df = county_fips_df[['GeoFIPS', 'Region']]
-county_fips_df['Region'] = county_fips_df['Region'].str.strip()
-county_fips_df['GeoFIPS'] = pd.to_numeric(county_fips_df['GeoFIPS'])
-
-
-
-soybeans_df = pd.read_csv("soybeans.csv")
-
-soybeans_df = soybeans_df[['Year', 'State ANSI', 'County ANSI', 'Value']].dropna()
-soybeans_df['GeoFIPS'] = (soybeans_df['State ANSI'] * 1000 + soybeans_df['County ANSI']).astype(int)
-#pivoted_soybeans_df = soybeans_df.pivot(index=['State ANSI', 'County ANSI'], columns='Year', values='Value')
-pivoted_soybeans_df = soybeans_df.pivot(index='GeoFIPS', columns='Year', values='Value')
-
-
-print(pivoted_soybeans_df.columns)
-#pivoted_soybeans_df['GeoFIPS'] = (pivoted_soybeans_df['State ANSI'] * 1000 + pivoted_soybeans_df['County ANSI']).astype(int)
-
-pivoted_soybeans_df = pd.merge(county_fips_df, pivoted_soybeans_df, on = 'GeoFIPS', how='right')
-pivoted_soybeans_df.to_csv('pivoted_soybeans.csv', index=False)
-
-
-
-
-gdp_df = pd.read_csv("gdp.csv")
-
-gdp_df = gdp_df.drop(gdp_df.columns[[1, 2, 3, 4, 5, 7]], axis=1)
-
-gdp_df['GeoFIPS'] = pd.to_numeric(gdp_df['GeoFIPS'].str[2:7])
-
-
-gdp_df = pd.merge(county_fips_df, gdp_df, on = 'GeoFIPS', how='right')
-
-total_gdp_df = gdp_df[gdp_df['Description'].astype(str).str.strip().eq("All industry total")]
-ag_gdp_df = gdp_df[gdp_df['Description'].astype(str).str.strip().eq("Agriculture, forestry, fishing and hunting")]
-
-total_gdp_df = total_gdp_df.drop('Description', axis=1)
-ag_gdp_df = ag_gdp_df.drop('Description', axis=1)
-
-
-ag_gdp_df.to_csv('ag_gdp.csv', index=False)
-total_gdp_df.to_csv('total_gdp.csv', index=False)
-
-
-
-
-
-
-
-
-
-
-
+import polars as pl
+
+# Lazy pipeline: each source is scanned once, with only the needed columns
+# read (projection pushdown) and the Description/null filters applied during
+# the scan (predicate pushdown). Every output is written as CSV and Parquet;
+# the loaders read the Parquet files directly when they exist.
+
+GDP_LINES = {
+    "All industry total": "total_gdp",
+    "Agriculture, forestry, fishing and hunting": "ag_gdp",
+}
+
+
+def county_fips():
+    lf = pl.scan_csv("county_fips.csv", infer_schema=False)
+    columns = lf.collect_schema().names()
+
+    # Older exports packed both fields into one space-separated column
+    if columns == ["GeoFIPS      Region"]:
+        parts = pl.col(columns[0]).str.splitn(" ", 2)
+        lf = lf.select(
+            parts.struct.field("field_0").alias("GeoFIPS"),
+            parts.struct.field("field_1").alias("Region"),
+        )
+
+    return lf.select(
+        pl.col("GeoFIPS").str.strip_chars().cast(pl.Int64),
+        pl.col("Region").str.strip_chars(),
+    )
+
+
+def soybean_pivot(fips):
+    soybeans = (
+        pl.scan_csv("soybeans.csv", infer_schema=False)
+        .select("Year", "State ANSI", "County ANSI", "Value")
+        .filter(pl.all_horizontal(pl.all().is_not_null() & (pl.all().str.strip_chars() != "")))
+        .select(
+            (pl.col("State ANSI").cast(pl.Int64) * 1000 + pl.col("County ANSI").cast(pl.Int64)).alias("GeoFIPS"),
+            pl.col("Year").cast(pl.Int64),
+            pl.col("Value").str.replace_all(",", "").cast(pl.Float64, strict=False),
+        )
+        .collect()
+    )
+
+    pivoted = soybeans.sort("Year").pivot(on="Year", index="GeoFIPS", values="Value", aggregate_function="last")
+    years = [c for c in pivoted.columns if c != "GeoFIPS"]
+
+    return (
+        pivoted.lazy()
+        .join(fips, on="GeoFIPS", how="left")
+        .select("GeoFIPS", "Region", *years)
+        .sort("GeoFIPS")
+        .collect()
+    )
+
+
+def gdp_tables(fips):
+    gdp = pl.scan_csv("gdp.csv", infer_schema=False)
+    schema = gdp.collect_schema().names()
+    # Same columns the pandas version kept: GeoFIPS, Description and the years
+    years = schema[8:]
+
+    lines = (
+        gdp.select(
+            pl.col("GeoFIPS").str.slice(2, 5).cast(pl.Int64, strict=False).alias("GeoFIPS"),
+            pl.col("Description").str.strip_chars(),
+            *years,
+        )
+        .filter(pl.col("Description").is_in(list(GDP_LINES)))
+        .with_row_index("order")
+        .join(fips, on="GeoFIPS", how="left")
+        .sort("order")
+        .collect()
+    )
+
+    return {
+        name: lines.filter(pl.col("Description") == description).select("GeoFIPS", "Region", *years)
+        for description, name in GDP_LINES.items()
+    }
+
+
+def write(df, name):
+    df.write_csv(f"{name}.csv")
+    df.write_parquet(f"{name}.parquet")
+
+
+if __name__ == "__main__":
+    fips = county_fips().collect().lazy()
+
+    write(soybean_pivot(fips), "pivoted_soybeans")
+
+    for name, df in gdp_tables(fips).items():
+        write(df, name)
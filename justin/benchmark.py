@@ -0,0 +1,361 @@
+"""Benchmarks for the loaders and the export endpoint.
+
+    python -m justin.benchmark --scales 1 10 100 --out bench.json
+
+Synthetic inputs are generated per scale. At 1x they are about the size of
+the repo's own data: every county in chris/county_fips.csv, 19 years of
+soybean and GDP values, and one year of daily weather per county. Scale N
+repeats the county list N times under made-up FIPS codes, so every table
+grows N-fold. Generated files are kept in --data-dir and reused, so runs on
+different commits load identical inputs.
+
+Each scale gets a fresh database on a disposable server. That is either a
+throwaway cluster started with initdb/pg_ctl (from PATH or PG_BIN), or a
+temporary database on the server at --admin-url / BENCH_ADMIN_URL. The
+loaders run as `python -m justin.ingest` subprocesses, and the export
+endpoint runs under uvicorn and is timed over HTTP. Every stage records
+rows/sec and the peak RSS of its process; exports also record p50/p95
+latency. Results are written as JSON together with the git commit.
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import shutil
+import socket
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import urllib.request
+
+import psycopg2
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA = os.path.join(REPO_ROOT, "justin", "schema.sql")
+ENDPOINT_DIR = os.path.join(REPO_ROOT, "justin", "endpoint")
+COUNTY_FIPS = os.path.join(REPO_ROOT, "chris", "county_fips.csv")
+
+YEARS = list(range(2005, 2024))
+WEATHER_YEAR = 2023
+EXPORT_FORMATS = ("csv", "csv.gz", "parquet", "arrow")
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_measured(cmd, env, cwd=REPO_ROOT):
+    """Run `cmd` to completion; returns (seconds, peak RSS in MB, output)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output = proc.stdout.read()
+    # wait4 reports the rusage of this one child, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed with exit code {proc.returncode}:\n{output}")
+    return seconds, usage.ru_maxrss / 1024, output
+
+class DisposablePostgres:
+    """A server where databases can be created and dropped freely."""
+
+    def __init__(self, admin_url=None):
+        self.admin_url = admin_url
+        self.directory = None
+
+    def __enter__(self):
+        if not self.admin_url:
+            self._start_cluster()
+        return self
+
+    def __exit__(self, *exc):
+        if self.directory:
+            subprocess.run([self._bin("pg_ctl"), "-D", self.data_dir, "stop", "-m", "fast"], capture_output=True)
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _bin(self, name):
+        pg_bin = os.getenv("PG_BIN")
+        path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"{name} not found; put the Postgres binaries on PATH, set PG_BIN, or pass --admin-url")
+        return path
+
+    def _start_cluster(self):
+        self.directory = tempfile.mkdtemp(prefix="soy_bench_pg_")
+        self.data_dir = os.path.join(self.directory, "data")
+        for cmd in (
+            [self._bin("initdb"), "-D", self.data_dir, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            [
+                self._bin("pg_ctl"), "-D", self.data_dir, "-l", os.path.join(self.directory, "server.log"), "-w",
+                "-o", f"-k {self.directory} -c listen_addresses=''", "start"
+            ],
+        ):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = None
+                raise RuntimeError(f"{os.path.basename(cmd[0])} failed: {result.stderr.strip()}")
+        self.admin_url = f"postgresql://postgres@/postgres?host={self.directory}"
+
+    def _admin(self, statement):
+        conn = psycopg2.connect(self.admin_url)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(statement)
+        finally:
+            conn.close()
+
+    def create_database(self, name):
+        self._admin(f"DROP DATABASE IF EXISTS {name}")
+        self._admin(f"CREATE DATABASE {name}")
+        base, _, query = self.admin_url.partition("?")
+        url = base.rsplit("/", 1)[0] + f"/{name}" + (f"?{query}" if query else "")
+        conn = psycopg2.connect(url)
+        try:
+            with conn.cursor() as cursor, open(SCHEMA, encoding="utf-8") as f:
+                cursor.execute(f.read())
+            conn.commit()
+        finally:
+            conn.close()
+        return url
+
+    def drop_database(self, name):
+        self._admin(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+
+def base_counties():
+    """(fips, name, state name) for every real county."""
+    with open(COUNTY_FIPS, encoding="utf-8", newline="") as f:
+        rows = [(int(row[0]), row[1]) for row in csv.reader(f) if row and row[0].isdigit()]
+    states = {fips // 1000: name for fips, name in rows if fips % 1000 == 0}
+    return [(fips, name, states[fips // 1000]) for fips, name in rows if fips % 1000 and fips // 1000 in states]
+
+def scaled_counties(scale):
+    """The real counties, then scale-1 copies under FIPS codes >= 100000."""
+    counties = []
+    for copy in range(scale):
+        for fips, name, state in base_counties():
+            if copy == 0:
+                counties.append((f"{fips:05d}", name, state))
+            else:
+                counties.append((f"{copy}{fips:05d}", f"{name} {copy}", state))
+    return counties
+
+def generate(data_dir, scale, seed=5707):
+    """Write the synthetic inputs for `scale` (unless present); returns paths and row counts."""
+    directory = os.path.join(data_dir, f"scale_{scale}")
+    paths = {name: os.path.join(directory, f"{name}.csv") for name in ("counties", "agricultural", "economy", "weather")}
+    counties = scaled_counties(scale)
+    days = (datetime.date(WEATHER_YEAR + 1, 1, 1) - datetime.date(WEATHER_YEAR, 1, 1)).days
+    rows = {
+        "counties": len(counties),
+        "agricultural": len(counties) * len(YEARS),
+        "economy": len(counties) * len(YEARS),
+        "weather": len(counties) * days,
+    }
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths, rows
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    print(f"Generating scale {scale}x inputs in {directory}...")
+
+    # Written to .tmp first, so an interrupted run is regenerated next time
+    with open(paths["counties"] + ".tmp", "w", newline="") as f:
+        writer = csv.writer(f)
+        # The full state name passes through the loader's abbreviation lookup unchanged
+        writer.writerow(["fips", "name", "state"])
+        writer.writerows(counties)
+
+    for name, low, high in (("agricultural", 20.0, 70.0), ("economy", 1e5, 5e7)):
+        with open(paths[name] + ".tmp", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["GeoFIPS", "Region", *YEARS])
+            for fips, county, _ in counties:
+                writer.writerow([fips, county, *(f"{rng.uniform(low, high):.1f}" for _ in YEARS)])
+
+    dates = [datetime.date(WEATHER_YEAR, 1, 1) + datetime.timedelta(days=i) for i in range(days)]
+    with open(paths["weather"] + ".tmp", "w", newline="") as f:
+        f.write("GeoFIPS,county,date,precip_mm,tavg_C,tmax_C,tmin_C\n")
+        for fips, county, _ in counties:
+            lines = []
+            for date in dates:
+                tavg = rng.uniform(-10.0, 30.0)
+                lines.append(
+                    f"{fips},{county},{date},{rng.expovariate(0.4):.2f},{tavg:.2f},{tavg + 6:.2f},{tavg - 6:.2f}\n"
+                )
+            f.writelines(lines)
+
+    for path in paths.values():
+        os.replace(path + ".tmp", path)
+    return paths, rows
+
+def bench_loaders(paths, rows, env, workers):
+    results = []
+    stages = [(name, ["--file", paths[name]]) for name in ("counties", "agricultural", "economy", "weather")]
+    if workers > 1:
+        stages.append(("weather", ["--file", paths["weather"], "--workers", str(workers)]))
+
+    for dataset, args in stages:
+        if "--workers" in args:
+            # Start from an empty table, as the serial stage did, so the
+            # checksums don't skip every county_year it already loaded
+            empty_weather(env["DATABASE_URL"])
+        cmd = [sys.executable, "-m", "justin.ingest", dataset, *args, "--force"]
+        seconds, rss, _ = run_measured(cmd, env)
+        stage = dataset if "--workers" not in args else f"{dataset}_parallel"
+        results.append({
+            "stage": stage,
+            "rows": rows[dataset],
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows[dataset] / seconds, 1),
+            "peak_rss_mb": round(rss, 1),
+        })
+        print(f"  {stage}: {rows[dataset]:,} rows in {seconds:.2f}s ({rows[dataset] / seconds:,.0f} rows/sec, {rss:.0f} MB)")
+    return results
+
+def empty_weather(url):
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("TRUNCATE weather")
+            cursor.execute("DELETE FROM load_checksum WHERE table_name = 'weather'")
+        conn.commit()
+    finally:
+        conn.close()
+
+def fetch(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        size = len(response.read())
+    return time.perf_counter() - start, size
+
+def bench_export(url, env, requests, cached):
+    """Time every export format over HTTP; returns one result per format."""
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM soybean_data_view")
+            export_rows = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    port = free_port()
+    env = dict(env)
+    if not cached:
+        # Every request goes to Postgres
+        env["EXPORT_CACHE_MAX_ENTRY_BYTES"] = "0"
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    log = tempfile.TemporaryFile(mode="w+")
+    server = subprocess.Popen(cmd, cwd=ENDPOINT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                fetch(f"{base}/status")
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    log.seek(0)
+                    raise RuntimeError(f"Export server did not start:\n{log.read()}")
+                time.sleep(0.2)
+
+        for fmt in EXPORT_FORMATS:
+            target = f"{base}/?format={fmt}"
+            # One untimed request warms the pool (and the cache, when enabled)
+            fetch(target)
+            timings = []
+            size = 0
+            for _ in range(requests):
+                seconds, size = fetch(target)
+                timings.append(seconds)
+            p50 = percentile(timings, 50)
+            results.append({
+                "stage": "export_cached" if cached else "export",
+                "format": fmt,
+                "rows": export_rows,
+                "bytes": size,
+                "requests": requests,
+                "p50_ms": round(p50 * 1000, 2),
+                "p95_ms": round(percentile(timings, 95) * 1000, 2),
+                "rows_per_sec": round(export_rows / p50, 1) if p50 else None,
+            })
+            print(f"  {results[-1]['stage']} {fmt}: p50 {p50 * 1000:.1f} ms, p95 {results[-1]['p95_ms']:.1f} ms ({size:,} bytes)")
+    finally:
+        server.terminate()
+        _, _, usage = os.wait4(server.pid, 0)
+        server.returncode = 0
+        log.close()
+    for result in results:
+        result["peak_rss_mb"] = round(usage.ru_maxrss / 1024, 1)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m justin.benchmark", description="Benchmark the loaders and the export endpoint on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1], help="Data scales to run, e.g. 1 10 100 (default: 1)")
+    parser.add_argument("--out", default="benchmark.json", help="JSON results file (default: benchmark.json)")
+    parser.add_argument("--data-dir", default=os.path.join(REPO_ROOT, ".cache", "benchmark"), help="Where generated inputs are kept")
+    parser.add_argument("--admin-url", default=os.getenv("BENCH_ADMIN_URL"), help="Existing server to create throwaway databases on (default: start one with initdb)")
+    parser.add_argument("--requests", type=int, default=20, help="Timed requests per export format")
+    parser.add_argument("--workers", type=int, default=0, help="Also time the parallel weather loader with this many workers")
+    parser.add_argument("--skip-export", action="store_true", help="Only benchmark the loaders")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+
+    with DisposablePostgres(args.admin_url) as server:
+        for scale in args.scales:
+            paths, rows = generate(args.data_dir, scale)
+            name = f"soy_bench_{scale}x"
+            url = server.create_database(name)
+            env = {**os.environ, "DATABASE_URL": url, "INGEST_CACHE_DIR": os.path.join(args.data_dir, "resolver")}
+            print(f"Scale {scale}x:")
+            try:
+                results = bench_loaders(paths, rows, env, args.workers)
+                if not args.skip_export:
+                    results += bench_export(url, env, args.requests, cached=False)
+                    results += bench_export(url, env, args.requests, cached=True)
+                if "postgres" not in report:
+                    conn = psycopg2.connect(url)
+                    with conn.cursor() as cursor:
+                        cursor.execute("SHOW server_version")
+                        report["postgres"] = cursor.fetchone()[0]
+                    conn.close()
+            finally:
+                server.drop_database(name)
+            report["results"] += [{"scale": scale, **result} for result in results]
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import math
+import time
+import asyncio
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from formats import BATCH_ROWS, FEATURE_SCHEMA, to_record_batch
+
+# The joined county-year dataset behind soybean_data_view, with both weather
+# windows side by side and the weather_features columns
+ANALYTICS_SCHEMA = pa.schema([
+    ("geofips", pa.string()),
+    ("county_name", pa.string()),
+    ("state", pa.string()),
+    ("year", pa.int32()),
+    ("soybean_total_production", pa.float64()),
+    ("total_gdp", pa.float64()),
+    ("precip_full", pa.float64()),
+    ("tavg_full", pa.float64()),
+    ("precip_growing", pa.float64()),
+    ("tavg_growing", pa.float64()),
+    *[(field.name, pa.float64()) for field in FEATURE_SCHEMA],
+])
+
+QUERY = f"""
+    SELECT {", ".join(f"v.{name}" for name in ANALYTICS_SCHEMA.names[:10])},
+        {", ".join(f"wf.{name}" for name in FEATURE_SCHEMA.names)}
+    FROM soybean_data_view v
+    LEFT JOIN weather_features wf ON wf.county_year_id = v.county_year_id
+"""
+
+METRICS = tuple(ANALYTICS_SCHEMA.names[4:])
+
+# group_by value -> key columns
+GROUPS = {
+    "state": ["state"],
+    "year": ["year"],
+    "state_year": ["state", "year"],
+    "county": ["geofips", "county_name", "state"],
+}
+
+AGGREGATES = ("mean", "sum", "min", "max", "stddev", "count")
+
+class AnalyticsTable:
+    """In-memory Arrow copy of the county-year dataset, one per data version.
+
+    The first query after data_version changes reloads it from Postgres
+    (one scan of the view); every other query is answered from memory.
+    """
+
+    def __init__(self):
+        self.table = None
+        self.version = None
+        self.load_seconds = None
+        self._lock = asyncio.Lock()
+
+    def current(self, version):
+        # An unknown version (data_version unreadable) keeps what is loaded
+        return self.table is not None and (version is None or version == self.version)
+
+    async def get(self, pool, version):
+        if not self.current(version):
+            async with self._lock:
+                if not self.current(version):
+                    start = time.perf_counter()
+                    self.table = await load_table(pool)
+                    self.version = version
+                    self.load_seconds = time.perf_counter() - start
+        return self.table
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "rows": self.table.num_rows if self.table is not None else 0,
+            "bytes": self.table.nbytes if self.table is not None else 0,
+            "load_ms": round(self.load_seconds * 1000, 1) if self.load_seconds is not None else None,
+        }
+
+async def load_table(pool):
+    batches = []
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor(name="analytics_load") as cur:
+                await cur.execute(QUERY)
+                while rows := await cur.fetchmany(BATCH_ROWS):
+                    batches.append(to_record_batch(rows, ANALYTICS_SCHEMA))
+    return pa.Table.from_batches(batches, schema=ANALYTICS_SCHEMA).combine_chunks()
+
+def filter_table(table, start=None, end=None, states=None, counties=None):
+    conditions = []
+    if start is not None:
+        conditions.append(pc.greater_equal(table["year"], start))
+    if end is not None:
+        conditions.append(pc.less_equal(table["year"], end))
+    if states:
+        conditions.append(pc.is_in(table["state"], value_set=pa.array(states, pa.string())))
+    if counties:
+        geofips = [county.strip().zfill(5) for county in counties]
+        conditions.append(pc.is_in(table["geofips"], value_set=pa.array(geofips, pa.string())))
+    if not conditions:
+        return table
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = pc.and_(mask, condition)
+    return table.filter(mask)
+
+def with_group_key(table, keys):
+    # An ungrouped query is one group under a constant key
+    if keys:
+        return table, keys
+    return table.append_column("_all", pa.array([0] * table.num_rows, pa.int8())), ["_all"]
+
+def rows_without(table, column):
+    return [{k: v for k, v in row.items() if k != column} for row in table.to_pylist()]
+
+def aggregate(table, metric, keys, aggregates):
+    table, group_keys = with_group_key(table.select(keys + [metric]), keys)
+    # Sample standard deviation, like Postgres' stddev()
+    result = table.group_by(group_keys).aggregate([
+        (metric, agg, pc.VarianceOptions(ddof=1)) if agg == "stddev" else (metric, agg) for agg in aggregates
+    ])
+    if keys:
+        result = result.sort_by([(key, "ascending") for key in keys])
+    elif result.num_rows == 0:
+        # Like SQL without GROUP BY: one row, count 0, the rest null
+        return [{f"{metric}_{agg}": 0 if agg == "count" else None for agg in aggregates}]
+    return rows_without(result, "_all")
+
+def correlation(table, x, y, keys):
+    """Pearson r of x and y per group, over rows where both are present.
+
+    Two passes (group means, then centered sums) keep it stable for large
+    values like production totals.
+    """
+    table = table.filter(pc.and_(pc.is_valid(table[x]), pc.is_valid(table[y])))
+    pairs = table.select(keys).append_column("_x", table[x]).append_column("_y", table[y])
+    pairs, group_keys = with_group_key(pairs, keys)
+
+    means = pairs.group_by(group_keys).aggregate([("_x", "mean"), ("_y", "mean"), ("_x", "count")])
+    joined = pairs.join(means, group_keys)
+    dx = pc.subtract(joined["_x"], joined["_x_mean"])
+    dy = pc.subtract(joined["_y"], joined["_y_mean"])
+    joined = (
+        joined.select(group_keys + ["_x_count"])
+        .append_column("_dxdy", pc.multiply(dx, dy))
+        .append_column("_dx2", pc.multiply(dx, dx))
+        .append_column("_dy2", pc.multiply(dy, dy))
+    )
+    sums = joined.group_by(group_keys).aggregate(
+        [("_dxdy", "sum"), ("_dx2", "sum"), ("_dy2", "sum"), ("_x_count", "max")]
+    )
+    if keys:
+        sums = sums.sort_by([(key, "ascending") for key in keys])
+
+    rows = []
+    for row in sums.to_pylist():
+        spread = row["_dx2_sum"] * row["_dy2_sum"]
+        out = {key: row[key] for key in keys}
+        out["n"] = row["_x_count_max"]
+        out["r"] = row["_dxdy_sum"] / math.sqrt(spread) if spread > 0 else None
+        rows.append(out)
+    return rows
+
+def rank(table, metric, descending=True, limit=25):
+    """Counties ordered by their mean `metric` over the filtered years."""
+    per_county = (
+        table.select(["geofips", "county_name", "state", metric])
+        .filter(pc.is_valid(table[metric]))
+        .group_by(["geofips", "county_name", "state"])
+        .aggregate([(metric, "mean"), (metric, "count")])
+        .sort_by([(f"{metric}_mean", "descending" if descending else "ascending"), ("geofips", "ascending")])
+        .slice(0, limit)
+    )
+    return [{"rank": i, **row} for i, row in enumerate(per_county.to_pylist(), start=1)]
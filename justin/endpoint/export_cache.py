@@ -0,0 +1,100 @@
+import gzip
+import zlib
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+# Compressed bytes inflated per step when streaming a gzipped entry as plain text
+PLAIN_CHUNK = 64 * 1024
+
+class CachedExport:
+    def __init__(self, body, gzipped, etag, media_type):
+        self.body = body
+        self.gzipped = gzipped
+        self.etag = etag
+        self.media_type = media_type
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    async def plain(self):
+        """The uncompressed body, inflated one slice at a time as it is sent."""
+        body = memoryview(self.body)
+        decompressor = zlib.decompressobj(31) if self.gzipped else None
+        for i in range(0, len(body), PLAIN_CHUNK):
+            chunk = body[i:i + PLAIN_CHUNK]
+            yield decompressor.decompress(chunk) if decompressor else bytes(chunk)
+
+class ExportCache:
+    """Size-bounded LRU of encoded export responses.
+
+    Entries belong to one data version: `set_version` drops everything once
+    the loaders bump data_version, and `put` ignores bodies rendered against
+    an older version than the current one.
+    """
+
+    def __init__(self, max_bytes, max_entry_bytes, compress=True):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.compress = compress
+        self.version = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def etag(self, key, version):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return f'"v{version}-{digest}"'
+
+    def set_version(self, version):
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    async def put(self, key, version, body, media_type, compressible=True):
+        if version is None or version != self.version or len(body) > self.max_entry_bytes:
+            return None
+        gzipped = self.compress and compressible
+        if gzipped:
+            # Bodies run to tens of MB, so compress off the event loop
+            body = await asyncio.to_thread(gzip.compress, body, 6)
+            if version != self.version:
+                return None
+        entry = CachedExport(body, gzipped, self.etag(key, version), media_type)
+        if entry.size > self.max_bytes:
+            return None
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+        return entry
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
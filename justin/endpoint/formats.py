@@ -0,0 +1,181 @@
+import zlib
+import time
+import asyncio
+from contextlib import aclosing
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "csv.gz": ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+# Rows fetched from the server-side cursor per record batch / row group
+BATCH_ROWS = 50000
+
+EXPORT_SCHEMA = pa.schema([
+    ("geofips", pa.string()),
+    ("county_name", pa.string()),
+    ("state", pa.string()),
+    ("year", pa.int32()),
+    ("precip_mm_total", pa.float64()),
+    ("tavg_c", pa.float64()),
+    ("soybean_total_production", pa.float64()),
+    ("total_gdp", pa.float64()),
+])
+
+# Optional weather_features columns, appended to EXPORT_SCHEMA when requested
+FEATURE_SCHEMA = pa.schema(
+    [
+        ("gdd_full", pa.float64()),
+        ("gdd_growing", pa.float64()),
+        ("heat_days_full", pa.int32()),
+        ("heat_days_growing", pa.int32()),
+        ("dry_spell_growing", pa.int32()),
+    ]
+    + [(f"precip_{month}", pa.float64()) for month in (
+        "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"
+    )]
+)
+
+def export_schema(features=False):
+    if not features:
+        return EXPORT_SCHEMA
+    return pa.schema(list(EXPORT_SCHEMA) + list(FEATURE_SCHEMA))
+
+class ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+async def gzip_stream(chunks, timer=None):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    # Closing this stream early closes the one it wraps
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            start = time.perf_counter()
+            data = compressor.compress(chunk)
+            if timer:
+                timer.add("encode", time.perf_counter() - start)
+            if data:
+                yield data
+    yield compressor.flush()
+
+async def gunzip_stream(chunks):
+    # Handles concatenated gzip members, as in multi-year snapshot ranges
+    decompressor = zlib.decompressobj(31)
+    async for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(31)
+            else:
+                chunk = b""
+
+def open_writer(fmt, sink, schema=EXPORT_SCHEMA):
+    f = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        return pq.ParquetWriter(f, schema, compression="zstd")
+    return pa.ipc.new_stream(f, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+def to_record_batch(rows, schema=EXPORT_SCHEMA):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema
+    )
+
+def encode_rows(writer, sink, rows, schema):
+    writer.write_batch(to_record_batch(rows, schema))
+    return sink.drain()
+
+def encode_next(batches, writer, sink):
+    """Read and encode the next batch; None once `batches` is exhausted."""
+    batch = next(batches, None)
+    if batch is None:
+        return None
+    writer.write_batch(batch)
+    return sink.drain()
+
+def close_writer(writer, sink):
+    writer.close()
+    return sink.drain()
+
+# Building, encoding and reading Arrow data is CPU and file work, so the
+# streams below run it in worker threads and keep the event loop free.
+
+async def stream_record_batches(conn, query, params, fmt, timer=None, schema=EXPORT_SCHEMA):
+    # A server-side cursor keeps only BATCH_ROWS rows in memory at a time;
+    # each batch becomes one Parquet row group / Arrow IPC message.
+    sink = ChunkSink()
+    writer = open_writer(fmt, sink, schema)
+    async with conn.transaction():
+        async with conn.cursor(name="export_batches") as cur:
+            start = time.perf_counter()
+            await cur.execute(query, params)
+            while True:
+                rows = await cur.fetchmany(BATCH_ROWS)
+                fetched = time.perf_counter()
+                if not rows:
+                    break
+                data = await asyncio.to_thread(encode_rows, writer, sink, rows, schema)
+                if timer:
+                    timer.add("fetch", fetched - start)
+                    timer.add("encode", time.perf_counter() - fetched)
+                if data:
+                    yield data
+                start = time.perf_counter()
+            if timer:
+                timer.add("fetch", fetched - start)
+    start = time.perf_counter()
+    data = await asyncio.to_thread(close_writer, writer, sink)
+    if timer:
+        timer.add("encode", time.perf_counter() - start)
+    yield data
+
+async def stream_parquet_files(paths, fmt, timer=None):
+    # Re-encodes snapshot row groups as one Parquet file / Arrow stream
+    sink = ChunkSink()
+    writer = open_writer(fmt, sink)
+    for path in paths:
+        parquet = await asyncio.to_thread(pq.ParquetFile, path)
+        batches = parquet.iter_batches(batch_size=BATCH_ROWS)
+        while True:
+            start = time.perf_counter()
+            data = await asyncio.to_thread(encode_next, batches, writer, sink)
+            if timer:
+                timer.add("encode", time.perf_counter() - start)
+            if data is None:
+                break
+            if data:
+                yield data
+        parquet.close()
+    yield await asyncio.to_thread(close_writer, writer, sink)
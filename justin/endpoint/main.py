@@ -1,21 +1,250 @@
-from fastapi import FastAPI, Query
-from fastapi.responses import StreamingResponse
-import pandas as pd
-import psycopg
-import io
+import asyncio
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 import os
-from typing import Optional
+from typing import Literal, Optional
 
-app = FastAPI()
+from analytics import AGGREGATES, GROUPS, METRICS, AnalyticsTable, aggregate, correlation, filter_table, rank
+from export_cache import ExportCache
+from formats import (
+    EXPORT_SCHEMA, FEATURE_SCHEMA, FORMATS, export_schema,
+    gzip_stream, gunzip_stream, stream_parquet_files, stream_record_batches,
+)
+from metrics import Counter, Histogram, StageTimer, render_gauges
+from snapshots import SnapshotStore, read_files
+
+# Application-lifetime pool, so exports skip the TLS/auth handshake per request
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Export response cache, invalidated when the loaders bump data_version
+CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("EXPORT_CACHE_MAX_ENTRY_BYTES", str(64 * 1024 * 1024)))
+CACHE_GZIP = os.getenv("EXPORT_CACHE_GZIP", "1") == "1"
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "5"))
+
+# Per-year export files written by the loaders (python -m justin.ingest with
+# the same EXPORT_SNAPSHOT_DIR); unset serves everything from Postgres
+SNAPSHOT_DIR = os.getenv("EXPORT_SNAPSHOT_DIR")
+
+# Opt-in slow-query tracing: exports that spend at least this many ms waiting
+# on the database get their query re-run under EXPLAIN (ANALYZE, BUFFERS),
+# and the plan is logged and kept for /slow-queries. 0 turns it off.
+EXPLAIN_SLOW_MS = float(os.getenv("EXPLAIN_SLOW_MS", "0"))
+SLOW_QUERIES_KEPT = int(os.getenv("SLOW_QUERIES_KEPT", "20"))
+
+# Export stages, as reported in /metrics and the Server-Timing header:
+#   cache  - response cache lookup
+#   snapshot - finding the snapshot files for the request
+#   pool   - waiting for a pooled connection
+#   query  - until the first chunk of the body was ready (time to first byte)
+#   fetch  - waiting on Postgres for rows, over the whole export
+#   encode - Parquet/Arrow batch building and gzip compression
+#   send   - handing chunks to the client (network and backpressure)
+#   total  - the whole request
+EXPORT_REQUESTS = Counter("export_requests_total", "Export requests by format and cache result", ("format", "cache"))
+EXPORT_BYTES = Counter("export_response_bytes_total", "Export response body bytes", ("format",))
+EXPORT_STAGE_SECONDS = Histogram("export_stage_seconds", "Time spent in each export stage", ("stage", "format"))
+
+async def fetch_data_version(pool):
+    try:
+        async with pool.connection() as conn:
+            cur = await conn.execute("SELECT version FROM data_version")
+            row = await cur.fetchone()
+            return row[0] if row else None
+    except Exception as e:
+        # Without a known version nothing is cached or served from cache
+        print(f"Could not read data_version: {e}")
+        return None
+
+async def watch_data_version(pool, cache):
+    while True:
+        await asyncio.sleep(DATA_VERSION_POLL_SECONDS)
+        cache.set_version(await fetch_data_version(pool))
+
+@asynccontextmanager
+async def lifespan(app):
+    pool = AsyncConnectionPool(
+        os.getenv("DATABASE_URL"),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        # Exports are single read-only statements; no transaction to clean up
+        kwargs={"autocommit": True},
+        open=False,
+    )
+    await pool.open()
+    app.state.pool = pool
+
+    cache = ExportCache(CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES, compress=CACHE_GZIP)
+    cache.set_version(await fetch_data_version(pool))
+    app.state.cache = cache
+    app.state.snapshots = SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+    app.state.analytics = AnalyticsTable()
+    app.state.slow_queries = deque(maxlen=SLOW_QUERIES_KEPT)
+    app.state.background = set()
+    watcher = asyncio.create_task(watch_data_version(pool, cache))
+    try:
+        yield
+    finally:
+        watcher.cancel()
+        await pool.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Bytes of CSV gathered from the COPY stream before each yield
+CHUNK_SIZE = 64 * 1024
+
+async def stream_copy(conn, statement, params, timer=None):
+    # COPY ... TO STDOUT hands rows over as Postgres produces them, so memory
+    # stays bounded and the first bytes go out before the query finishes
+    async with conn.cursor().copy(statement, params) as copy:
+        chunk = bytearray()
+        start = time.perf_counter()
+        async for data in copy:
+            if timer:
+                timer.add("fetch", time.perf_counter() - start)
+            chunk += data
+            if len(chunk) >= CHUNK_SIZE:
+                yield bytes(chunk)
+                chunk.clear()
+            start = time.perf_counter()
+        if timer:
+            timer.add("fetch", time.perf_counter() - start)
+        if chunk:
+            yield bytes(chunk)
+
+async def stream_export(pool, conn, fmt, query, params, timer=None, schema=EXPORT_SCHEMA):
+    try:
+        if fmt in ("csv", "csv.gz"):
+            chunks = stream_copy(conn, f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", params, timer)
+            if fmt == "csv.gz":
+                chunks = gzip_stream(chunks, timer)
+        else:
+            chunks = stream_record_batches(conn, query, params, fmt, timer, schema)
+        # On a disconnect this generator is closed mid-stream; close the
+        # COPY / cursor with it, so the connection goes back to the pool idle
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        await pool.putconn(conn)
+
+def in_background(app, coro):
+    # Kept referenced until done, so the task is not garbage collected
+    task = asyncio.create_task(coro)
+    app.state.background.add(task)
+    task.add_done_callback(app.state.background.discard)
+
+async def tee_to_cache(chunks, on_complete):
+    # Hand the whole body to on_complete once streamed, when small enough to cache
+    kept = []
+    kept_bytes = 0
+    # Closing this generator (a disconnect) closes the export under it
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            if kept_bytes <= CACHE_MAX_ENTRY_BYTES:
+                kept.append(chunk)
+                kept_bytes += len(chunk)
+            yield chunk
+    if kept_bytes <= CACHE_MAX_ENTRY_BYTES:
+        on_complete(b"".join(kept))
+
+def record_export(timer, fmt, cache, sent):
+    EXPORT_REQUESTS.inc(format=fmt, cache=cache)
+    EXPORT_BYTES.inc(sent, format=fmt)
+    for stage, seconds in timer.stages.items():
+        EXPORT_STAGE_SECONDS.observe(seconds, stage=stage, format=fmt)
+    EXPORT_STAGE_SECONDS.observe(timer.elapsed(), stage="total", format=fmt)
+
+async def explain_slow_query(app, query, params, fmt, timer):
+    # Runs after the response is done, on its own pooled connection
+    try:
+        async with app.state.pool.connection() as conn:
+            cur = await conn.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+            plan = "\n".join(row[0] for row in await cur.fetchall())
+    except Exception as e:
+        print(f"Could not EXPLAIN slow export: {e}")
+        return
+    db_ms = timer.stages.get("fetch", 0.0) * 1000
+    print(f"Slow export ({fmt}, {db_ms:.0f} ms in the database, params {params}):\n{plan}")
+    app.state.slow_queries.append({
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "format": fmt,
+        "params": params,
+        "db_ms": round(db_ms, 1),
+        "total_ms": round(timer.elapsed() * 1000, 1),
+        "plan": plan,
+    })
+
+async def prepend(first, chunks):
+    async with aclosing(chunks):
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+async def observed(app, chunks, timer, fmt, cache="miss", query=None, params=None):
+    """Re-yield the body, timing sends; records metrics once the body is done."""
+    sent = 0
+    try:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                start = time.perf_counter()
+                yield chunk
+                timer.add("send", time.perf_counter() - start)
+                sent += len(chunk)
+    finally:
+        record_export(timer, fmt, cache, sent)
+        if query and EXPLAIN_SLOW_MS and timer.stages.get("fetch", 0.0) * 1000 >= EXPLAIN_SLOW_MS:
+            in_background(app, explain_slow_query(app, query, params, fmt, timer))
+
+def snapshot_response(request, paths, fmt, media_type, headers, timer):
+    """Serve an export from snapshot files; single files go out as-is."""
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        response = Response(status_code=304, headers=headers)
+        record_export(timer, fmt, "not_modified", 0)
+        return response
+    headers["Server-Timing"] = timer.server_timing()
+    if len(paths) == 1 and fmt in ("csv.gz", "parquet"):
+        response = FileResponse(paths[0], media_type=media_type, headers=headers)
+        record_export(timer, fmt, "snapshot", os.path.getsize(paths[0]))
+        return response
+
+    if fmt == "csv.gz":
+        body = read_files(paths)
+    elif fmt == "csv":
+        body = gunzip_stream(read_files(paths))
+    else:
+        body = stream_parquet_files(paths, fmt, timer)
+    return StreamingResponse(observed(request.app, body, timer, fmt, "snapshot"), media_type=media_type, headers=headers)
+
+def cached_response(request, entry, fmt, headers, timer):
+    headers = {**headers, "ETag": entry.etag, "Vary": "Accept-Encoding", "Server-Timing": timer.server_timing()}
+    if request.headers.get("if-none-match") == entry.etag:
+        record_export(timer, fmt, "not_modified", 0)
+        return Response(status_code=304, headers=headers)
+    if entry.gzipped and "gzip" not in request.headers.get("accept-encoding", "").lower():
+        # Inflated while streaming rather than all at once on the event loop
+        return StreamingResponse(observed(request.app, entry.plain(), timer, fmt, "hit"), media_type=entry.media_type, headers=headers)
+    if entry.gzipped:
+        headers["Content-Encoding"] = "gzip"
+    record_export(timer, fmt, "hit", entry.size)
+    return Response(entry.body, media_type=entry.media_type, headers=headers)
 
 @app.get("/")
 async def export(
+    request: Request,
     start: Optional[int] = Query(None, description="Start year (inclusive)"),
     end: Optional[int] = Query(None, description="End year (inclusive)"),
-    growing_season: bool = Query(False, description="If true, filter weather data to growing season (May-Oct)")
+    growing_season: bool = Query(False, description="If true, filter weather data to growing season (May-Oct)"),
+    features: bool = Query(False, description="If true, add the weather feature columns (GDD, heat days, dry spell, monthly precip)"),
+    format: Literal["csv", "csv.gz", "parquet", "arrow"] = Query("csv", description="csv, csv.gz, parquet or arrow (IPC stream)")
 ):
-    conn = psycopg.connect(os.getenv("DATABASE_URL"))
-
     # Select columns based on growing season flag
     # Completeness check: ~6 months * 30 days = 180 days (using 150 as safe lower bound) vs 365 days (using 330 as safe lower bound)
     if growing_season:
@@ -25,8 +254,14 @@ async def export(
         precip_col = "precip_full"
         tavg_col = "tavg_full"
 
+    feature_columns = ""
+    feature_join = ""
+    if features:
+        feature_columns = "".join(f",\n            wf.{column}" for column in FEATURE_SCHEMA.names)
+        feature_join = "LEFT JOIN weather_features wf ON wf.county_year_id = v.county_year_id"
+
     query = f"""
-        SELECT 
+        SELECT
             geofips,
             county_name,
             state,
@@ -34,36 +269,205 @@ async def export(
             {precip_col} as precip_mm_total,
             {tavg_col} as tavg_c,
             soybean_total_production,
-            total_gdp
-        FROM soybean_data_view
-        WHERE 
+            total_gdp{feature_columns}
+        FROM soybean_data_view v
+        {feature_join}
+        WHERE
             (CAST(%(start)s AS INTEGER) IS NULL OR year >= CAST(%(start)s AS INTEGER))
             AND (CAST(%(end)s AS INTEGER) IS NULL OR year <= CAST(%(end)s AS INTEGER))
     """
 
-    # Execute query using pandas
     # Note: We use params to safely pass start/end arguments
     params = {"start": start, "end": end}
-    df = pd.read_sql(query, conn, params=params)
-    
-    conn.close()
 
-    # Convert DataFrame → CSV (streaming)
-    buffer = io.StringIO()
-    df.to_csv(buffer, index=False)
-    buffer.seek(0)
-
-    filename = "soybean_data_export.csv"
+    media_type, extension = FORMATS[format]
+    filename = "soybean_data_export"
     if growing_season:
-        filename = "soybean_data_export_growing_season.csv"
+        filename += "_growing_season"
+    if features:
+        filename += "_features"
+    filename += extension
 
     headers = {
         "Content-Disposition": f'attachment; filename="{filename}"'
     }
 
-    return StreamingResponse(buffer, media_type="text/csv", headers=headers)
+    timer = StageTimer()
+
+    # Cache hits never touch Postgres
+    cache = request.app.state.cache
+    key = (start, end, growing_season, features, format)
+    with timer.stage("cache"):
+        version = cache.version
+        entry = cache.get(key) if version is not None else None
+    if entry is not None:
+        return cached_response(request, entry, format, headers, timer)
+
+    # Then the loaders' snapshot files (not for feature columns, which
+    # snapshots do not include)
+    snapshots = request.app.state.snapshots
+    if snapshots is not None and version is not None and not features:
+        with timer.stage("snapshot"):
+            paths = snapshots.files(version, start, end, growing_season, format)
+        if paths is not None:
+            headers["ETag"] = cache.etag(key, version)
+            return snapshot_response(request, paths, format, media_type, headers, timer)
+
+    pool = request.app.state.pool
+    try:
+        with timer.stage("pool"):
+            conn = await pool.getconn()
+    except PoolTimeout:
+        EXPORT_REQUESTS.inc(format=format, cache="pool_timeout")
+        return database_busy()
+
+    body = stream_export(pool, conn, format, query, params, timer, export_schema(features))
+    if version is not None:
+        headers["ETag"] = cache.etag(key, version)
+        # Only plain CSV is worth gzipping again in the cache; that happens
+        # after the response, so the client does not wait for it
+        body = tee_to_cache(body, lambda data: in_background(
+            request.app, cache.put(key, version, data, media_type, compressible=format == "csv")
+        ))
+
+    # Wait for the first chunk here, so query errors still become a 500 and
+    # Server-Timing can report the stages up to the first byte. Later stages
+    # happen after the headers are sent and only show up in /metrics.
+    with timer.stage("query"):
+        first = await anext(body, b"")
+    headers["Server-Timing"] = timer.server_timing()
+
+    body = observed(request.app, prepend(first, body), timer, format, "miss", query, params)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 
 @app.get("/status")
-def home():
-    return {"status": "ok", "message": "CSV export server running"}
+def home(request: Request):
+    pool = request.app.state.pool
+    snapshots = request.app.state.snapshots
+    return {
+        "status": "ok",
+        "message": "CSV export server running",
+        "pool": {
+            "min_size": pool.min_size,
+            "max_size": pool.max_size,
+            "timeout": pool.timeout,
+            **pool.get_stats(),
+        },
+        "cache": request.app.state.cache.stats(),
+        "snapshots": snapshots.stats(request.app.state.cache.version) if snapshots else None,
+        "analytics": request.app.state.analytics.stats(),
+        "slow_queries": len(request.app.state.slow_queries),
+    }
+
+@app.get("/metrics")
+def metrics(request: Request):
+    lines = []
+    for metric in (EXPORT_REQUESTS, EXPORT_BYTES, EXPORT_STAGE_SECONDS):
+        lines += metric.render()
+    lines += render_gauges("export_pool", request.app.state.pool.get_stats(), "Connection pool stat")
+    lines += render_gauges("export_cache", request.app.state.cache.stats(), "Export cache stat")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.get("/slow-queries")
+def slow_queries(request: Request):
+    """Recent EXPLAIN (ANALYZE, BUFFERS) plans of exports over EXPLAIN_SLOW_MS, newest first."""
+    return {"threshold_ms": EXPLAIN_SLOW_MS, "queries": list(reversed(request.app.state.slow_queries))}
+
+# In-memory analytics over the county-year dataset (analytics.py). Metrics
+# are the columns of soybean_data_view with both weather windows
+# (precip_full / precip_growing, ...) plus the weather_features columns.
+
+def split_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+def bad_request(detail):
+    return JSONResponse({"detail": detail}, status_code=400)
+
+def database_busy():
+    return JSONResponse({"detail": "Database busy, try again later"}, status_code=503)
+
+async def analytics_rows(request, start, end, states, counties):
+    """The filtered analytics table, or None when no connection was free to load it."""
+    try:
+        table = await request.app.state.analytics.get(request.app.state.pool, request.app.state.cache.version)
+    except PoolTimeout:
+        return None
+    return filter_table(table, start, end, split_list(states), split_list(counties))
+
+def analytics_response(request, timer, body):
+    version = request.app.state.analytics.version
+    return JSONResponse({"version": version, **body}, headers={"Server-Timing": timer.server_timing()})
+
+@app.get("/analytics/aggregate")
+async def analytics_aggregate(
+    request: Request,
+    metric: str = Query("soybean_total_production", description="Column to aggregate"),
+    group_by: Optional[Literal["state", "year", "state_year", "county"]] = Query(None, description="Grouping; omit for one overall row"),
+    aggregates: str = Query("mean,min,max,count", description=f"Comma-separated: {', '.join(AGGREGATES)}"),
+    start: Optional[int] = Query(None, description="Start year (inclusive)"),
+    end: Optional[int] = Query(None, description="End year (inclusive)"),
+    states: Optional[str] = Query(None, description="Comma-separated state names"),
+    counties: Optional[str] = Query(None, description="Comma-separated county FIPS codes"),
+):
+    aggs = split_list(aggregates) or []
+    if metric not in METRICS:
+        return bad_request(f"Unknown metric {metric!r}, expected one of {list(METRICS)}")
+    if not aggs or any(agg not in AGGREGATES for agg in aggs):
+        return bad_request(f"aggregates must be a comma-separated list of {list(AGGREGATES)}")
+
+    timer = StageTimer()
+    with timer.stage("load"):
+        table = await analytics_rows(request, start, end, states, counties)
+    if table is None:
+        return database_busy()
+    with timer.stage("query"):
+        rows = aggregate(table, metric, GROUPS.get(group_by, []), aggs)
+    return analytics_response(request, timer, {"metric": metric, "group_by": group_by, "rows": rows})
+
+@app.get("/analytics/correlation")
+async def analytics_correlation(
+    request: Request,
+    x: str = Query("precip_growing", description="First column"),
+    y: str = Query("soybean_total_production", description="Second column"),
+    group_by: Optional[Literal["state", "year", "state_year", "county"]] = Query(None, description="Grouping; omit for one overall r"),
+    start: Optional[int] = Query(None, description="Start year (inclusive)"),
+    end: Optional[int] = Query(None, description="End year (inclusive)"),
+    states: Optional[str] = Query(None, description="Comma-separated state names"),
+    counties: Optional[str] = Query(None, description="Comma-separated county FIPS codes"),
+):
+    for column in (x, y):
+        if column not in METRICS:
+            return bad_request(f"Unknown column {column!r}, expected one of {list(METRICS)}")
+
+    timer = StageTimer()
+    with timer.stage("load"):
+        table = await analytics_rows(request, start, end, states, counties)
+    if table is None:
+        return database_busy()
+    with timer.stage("query"):
+        rows = correlation(table, x, y, GROUPS.get(group_by, []))
+    return analytics_response(request, timer, {"x": x, "y": y, "group_by": group_by, "rows": rows})
+
+@app.get("/analytics/rank")
+async def analytics_rank(
+    request: Request,
+    metric: str = Query("soybean_total_production", description="Column to rank counties by (mean over the years)"),
+    order: Literal["desc", "asc"] = Query("desc"),
+    limit: int = Query(25, ge=1, le=5000),
+    start: Optional[int] = Query(None, description="Start year (inclusive)"),
+    end: Optional[int] = Query(None, description="End year (inclusive)"),
+    states: Optional[str] = Query(None, description="Comma-separated state names"),
+    counties: Optional[str] = Query(None, description="Comma-separated county FIPS codes"),
+):
+    if metric not in METRICS:
+        return bad_request(f"Unknown metric {metric!r}, expected one of {list(METRICS)}")
+
+    timer = StageTimer()
+    with timer.stage("load"):
+        table = await analytics_rows(request, start, end, states, counties)
+    if table is None:
+        return database_busy()
+    with timer.stage("query"):
+        rows = rank(table, metric, order == "desc", limit)
+    return analytics_response(request, timer, {"metric": metric, "order": order, "rows": rows})
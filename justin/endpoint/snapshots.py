@@ -0,0 +1,68 @@
+import os
+import json
+import anyio
+
+# Bytes read from a snapshot file per chunk
+READ_SIZE = 256 * 1024
+
+class SnapshotStore:
+    """Export snapshots written by the loaders (justin/ingest/snapshot.py).
+
+    A snapshot belongs to one data_version and is only used while that is
+    the current version, so a load that has not written its snapshot yet
+    falls back to Postgres instead of serving stale files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._manifest = (None, None)
+
+    def manifest(self, version):
+        if self._manifest[0] != version:
+            path = os.path.join(self.directory, f"v{version}", "manifest.json")
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                # Not written yet; look again on the next request
+                return None
+            self._manifest = (version, manifest)
+        return self._manifest[1]
+
+    def files(self, version, start, end, growing_season, fmt):
+        """Snapshot files making up the export, in order, or None if there is no snapshot.
+
+        CSV lists are gzip members to concatenate (header first); Parquet
+        lists are files whose row groups make up the export.
+        """
+        manifest = self.manifest(version)
+        ext = "csv.gz" if fmt in ("csv", "csv.gz") else "parquet"
+        if manifest is None or ext not in manifest["formats"]:
+            return None
+
+        root = os.path.join(self.directory, f"v{version}")
+        season = os.path.join(root, "growing_season" if growing_season else "full")
+        years = [
+            year for year in manifest["years"]
+            if (start is None or year >= start) and (end is None or year <= end)
+        ]
+        if years == manifest["years"]:
+            return [os.path.join(season, f"all.{ext}")]
+        paths = [os.path.join(season, f"{year}.{ext}") for year in years]
+        if ext == "csv.gz":
+            paths.insert(0, os.path.join(root, "header.csv.gz"))
+        return paths
+
+    def stats(self, version):
+        manifest = self.manifest(version) if version is not None else None
+        return {
+            "directory": self.directory,
+            "version": manifest["version"] if manifest else None,
+            "years": len(manifest["years"]) if manifest else 0,
+        }
+
+async def read_files(paths):
+    for path in paths:
+        async with await anyio.open_file(path, "rb") as f:
+            while chunk := await f.read(READ_SIZE):
+                yield chunk
@@ -0,0 +1,76 @@
+"""Shared ingestion framework for the soybean database.
+
+Every dataset goes through the same single-pass CSV reader, batched
+COPY / execute_values writer and progress reporter. Run it from the repo
+root with `python -m justin.ingest <dataset> [--file PATH]`.
+
+Source files are fingerprinted in load_ledger, so re-running a load skips
+files that have not changed and reads only what was appended to the rest
+(see ledger.py); `--force` reloads regardless, bypassing the per
+county_year checksums too. With EXPORT_SNAPSHOT_DIR
+set, each load of a dataset behind soybean_data_view that changed data
+ends by writing export snapshots for the export service (see snapshot.py).
+"""
+
+import os
+
+from . import ledger
+from .db import get_connection, data_version, clear_checksums
+from .datasets import DATASETS, APPENDABLE, EXPORT_DATASETS, CHECKSUM_TABLES
+from .reader import prefer_parquet, is_compressed
+
+def run(dataset, path=None, backend="copy", batch_size=None, workers=None, force=False, **extra):
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}")
+    loader, default_path = DATASETS[dataset]
+    path = path or prefer_parquet(default_path)
+
+    if path and not os.path.exists(path):
+        print(f"File not found: {path}")
+        return
+
+    options = {"backend": backend}
+    if batch_size:
+        options["batch_size"] = batch_size
+    if workers:
+        options["workers"] = workers
+    # Dataset-specific options (e.g. nclimgrid's start/end); unset ones are left out
+    options.update({key: value for key, value in extra.items() if value is not None})
+
+    conn = get_connection()
+    try:
+        fingerprint = None
+        # Directories (nclimgrid) and downloads keep their own bookkeeping
+        if path and os.path.isfile(path):
+            appendable = dataset in APPENDABLE and not path.endswith(".parquet") and not is_compressed(path)
+            action, offset, fingerprint = ledger.plan(conn.cursor(), dataset, path, appendable, force)
+            if action == "skip":
+                print(f"{path} has not changed since the last {dataset} load, skipping.")
+                if fingerprint:
+                    ledger.record(conn, dataset, fingerprint)
+                return
+            if action == "append":
+                print(f"Resuming {path} at byte {offset:,}.")
+                options["offset"] = offset
+            if appendable:
+                # Stop where the ledger will resume, before a half-written last line
+                options["end"] = fingerprint["last_position"]
+
+        if force and dataset in CHECKSUM_TABLES:
+            # Rows removed from the table by hand (or a TRUNCATE) still have
+            # checksums; rewrite everything. Commits with the load.
+            clear_checksums(conn.cursor(), CHECKSUM_TABLES[dataset])
+        version = data_version(conn.cursor())
+        loader(conn, path, **options)
+        if fingerprint:
+            ledger.record(conn, dataset, fingerprint)
+        # commit_load only bumps data_version when a load changed data
+        if dataset in EXPORT_DATASETS and data_version(conn.cursor()) != version:
+            # Imported here so `python -m justin.ingest.snapshot` runs cleanly
+            from .snapshot import write_snapshots
+            write_snapshots(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,35 @@
+import argparse
+import datetime
+
+from . import run
+from .datasets import DATASETS
+from .writer import BACKENDS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m justin.ingest", description="Load a dataset into the soybean database.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--file", help="Source file, or directory for nclimgrid/nass/bea (defaults to the dataset's path in the repo)")
+    parser.add_argument("--batch-size", type=int, help="Rows per COPY / execute_values batch")
+    parser.add_argument("--backend", choices=BACKENDS, default="copy", help="Writer backend (default: copy)")
+    parser.add_argument("--force", action="store_true", help="Reload the file even if the load ledger says it has not changed, and rewrite every row even if its county_year checksum matches")
+    parser.add_argument("--workers", type=int, help="Worker processes for parallel loading (weather only)")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="First day to generate (nclimgrid only; default: day after the latest weather date)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="Last day to generate (nclimgrid only; default: yesterday)")
+    parser.add_argument("--counties", help="County polygon file (nclimgrid only; default: noaa_ds/us_counties)")
+    parser.add_argument("--geo-levels", help="Comma-separated Quick Stats geo levels to keep (nass only; default: COUNTY,STATE)")
+    args = parser.parse_args(argv)
+
+    if args.workers and args.dataset != "weather":
+        parser.error("--workers is only supported for the weather dataset")
+    if (args.start or args.end or args.counties) and args.dataset != "nclimgrid":
+        parser.error("--start, --end and --counties are only supported for the nclimgrid dataset")
+    if args.geo_levels and args.dataset != "nass":
+        parser.error("--geo-levels is only supported for the nass dataset")
+
+    run(
+        args.dataset, args.file, backend=args.backend, batch_size=args.batch_size, workers=args.workers,
+        force=args.force, start=args.start, end=args.end, counties=args.counties, geo_levels=args.geo_levels
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Column-at-a-time weather loading with pyarrow.
+
+The serial COPY path for weather_with_geo.csv (plain, .gz or .zst): the
+CSV is read in Arrow blocks, measures are parsed as whole columns, and
+counties and county_year ids are looked up once per distinct value in a
+block rather than once per row. The result is handed to COPY as CSV
+written by pyarrow, so no Python object is built per row.
+"""
+
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .db import load_cy_ids, ensure_weather_partitions, refresh_weather_summary, commit_load
+from .datasets import WEATHER_COLUMNS, WEATHER_KEY, WEATHER_ORDER
+from .reader import CsvBatchSource
+from .progress import Progress
+from .resolver import CountyResolver
+from .writer import UpsertWriter
+
+MEASURES = ("precip_mm", "tavg_C", "tmax_C", "tmin_C")
+
+# What float() accepts in practice, for blocks where a plain cast fails
+NUMBER = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$"
+
+# About one weather_with_geo.csv line, to turn --batch-size rows into a block size
+ROW_BYTES = 40
+
+SEP = "\x1f"
+
+def column(batch, name):
+    """Stripped string column, with blank fields as nulls (a missing column is all nulls)."""
+    i = batch.schema.get_field_index(name)
+    if i < 0:
+        return pa.nulls(batch.num_rows, pa.string())
+    values = pc.utf8_trim_whitespace(batch.column(i))
+    return pc.if_else(pc.equal(values, ""), pa.scalar(None, pa.string()), values)
+
+def parse_measure(values):
+    """(float64 values, mask of rows with an unparseable value)."""
+    try:
+        return pc.cast(values, pa.float64()), None
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        numeric = pc.match_substring_regex(values, NUMBER)
+        bad = pc.and_(pc.is_valid(values), pc.invert(numeric))
+        return pc.cast(pc.if_else(numeric, values, None), pa.float64()), bad
+
+class WeatherBatchParser:
+    """WeatherParser for Arrow record batches.
+
+    Rows are skipped exactly where WeatherParser.parse would return None:
+    no year, no county_year for the resolved county, or a measure that is
+    not a number.
+    """
+
+    def __init__(self, resolver, cy_ids):
+        self.resolver = resolver
+        self.cy_ids = cy_ids
+
+    def parse(self, batch):
+        """(table of WEATHER_COLUMNS, number of rows skipped)."""
+        dates = column(batch, "date")
+        has_year = pc.fill_null(pc.match_substring_regex(dates, r"^\d{4}"), False)
+        years = pc.utf8_slice_codeunits(dates, 0, 4)
+
+        geofips = self.resolver.resolve_columns(column(batch, "GeoFIPS"), column(batch, "county"), column(batch, "state"))
+        # One county_year lookup per distinct (geofips, year)
+        encoded = pc.dictionary_encode(pc.binary_join_element_wise(geofips, years, SEP))
+        ids = []
+        for key in encoded.dictionary.to_pylist():
+            fips, year = key.split(SEP)
+            ids.append(self.cy_ids.get((fips, int(year))) if re.fullmatch(r"\d{4}", year) else None)
+        cy_ids = pa.array(ids, pa.int32()).take(encoded.indices)
+
+        keep = pc.and_(has_year, pc.is_valid(cy_ids))
+        measures = []
+        for name in MEASURES:
+            values, bad = parse_measure(column(batch, name))
+            if bad is not None:
+                keep = pc.and_(keep, pc.invert(pc.fill_null(bad, False)))
+            measures.append(values)
+
+        table = pa.Table.from_arrays([cy_ids, dates, *measures], names=WEATHER_COLUMNS)
+        kept = table.filter(keep)
+        return kept, batch.num_rows - kept.num_rows
+
+def load_weather_batches(conn, path, batch_size=100000, offset=0, end=None):
+    cursor = conn.cursor()
+    resolver = CountyResolver.from_cursor(cursor)
+    parser = WeatherBatchParser(resolver, load_cy_ids(cursor))
+    ensure_weather_partitions(cursor)
+    writer = UpsertWriter(
+        cursor, "weather", WEATHER_COLUMNS, WEATHER_KEY, "copy", batch_size, checksums=True, order=WEATHER_ORDER
+    )
+
+    processed = 0
+    skipped = 0
+    with CsvBatchSource(path, offset=offset, block_size=batch_size * ROW_BYTES, end=end) as source:
+        progress = Progress("weather", source.size)
+        for batch in source:
+            processed += batch.num_rows
+            records, bad = parser.parse(batch)
+            skipped += bad
+            writer.add_batch(records)
+            progress.update(processed, source.position)
+        skipped += source.invalid
+        progress.update(processed, source.size)
+
+    inserted, updated = writer.close()
+    # Only county_years whose rows actually changed need a new summary
+    summarized = refresh_weather_summary(cursor, writer.changed)
+    commit_load(conn, changed=bool(inserted or updated))
+    progress.done(
+        inserted=inserted, updated=updated, skipped=skipped, ambiguous=resolver.stats["ambiguous"],
+        summarized=summarized
+    )
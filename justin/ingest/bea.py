@@ -0,0 +1,236 @@
+"""BEA regional tables (SASUMMARY, SAGDP*, CAGDP*, ...) in long format.
+
+BEA's CSV downloads are wide: a few title lines, then a
+GeoFips,GeoName,[Region,TableName,]LineCode,[IndustryClassification,]
+Description,[Unit,]<year>... header, one row per area and line, and
+footnotes after the data. Every line of every area is unpivoted into
+bea_value (line, geofips, year); the table, line code and description are
+stored once in bea_line. geofips is the county FIPS, SS000 for states and
+00000 for the US, as in nass_value.
+
+Suppressed or unavailable cells ((D), (NA), (NM), (L), ...) are kept with a
+NULL value and the code in `note`, so "withheld" stays distinguishable from
+"not in the file".
+"""
+
+import os
+import re
+import csv
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .batches import NUMBER
+from .reader import CsvSource, CsvBatchSource
+from .progress import Progress
+from .writer import UpsertWriter
+
+# Title lines are only looked for this far into a file
+MAX_PREAMBLE = 20
+
+# Trailing footnote reference: "Real GDP (millions of chained 2017 dollars) 1"
+FOOTNOTE = re.compile(r"(?<=\S)\s+\d{1,2}$")
+
+def find_header(path, encoding="utf-8"):
+    """Number of title lines before the GeoFips header, or None if there is none."""
+    with open(path, encoding=encoding, errors="replace") as f:
+        for i, line in enumerate(f):
+            if i >= MAX_PREAMBLE:
+                break
+            first = next(csv.reader([line]), [""])
+            if first and first[0].strip().lower() == "geofips":
+                return i
+    return None
+
+def annual_columns(header):
+    """(index, year) for every annual value column; quarterly tables have none."""
+    return [(i, int(name)) for i, name in enumerate(header) if name.strip().isdigit()]
+
+def table_name(source):
+    # "SASUMMARY State annual summary statistics: ..." -> "SASUMMARY"
+    if source.preamble and source.preamble[0].strip('"'):
+        return source.preamble[0].strip('"').split()[0]
+    return os.path.splitext(os.path.basename(source.path))[0]
+
+def bea_values(column):
+    """(float64 values, notes) for a year column of cell strings.
+
+    A number (thousands separators allowed) becomes a value; BEA's codes for
+    missing cells, "(D)" -> "D", and any other text become a NULL value with
+    the code in the note. Blank cells are null in both.
+    """
+    text = pc.utf8_trim_whitespace(column)
+    present = pc.fill_null(pc.not_equal(text, ""), False)
+    code = pc.starts_with(text, "(")
+    digits = pc.replace_substring(text, ",", "")
+    numeric = pc.and_(pc.invert(code), pc.match_substring_regex(digits, NUMBER))
+    values = pc.cast(pc.if_else(numeric, digits, pa.scalar(None, pa.string())), pa.float64())
+    notes = pc.if_else(
+        pc.and_(present, pc.invert(numeric)),
+        pc.utf8_slice_codeunits(pc.if_else(code, pc.utf8_trim(text, "()"), text), 0, 8),
+        pa.scalar(None, pa.string()),
+    )
+    return values, notes
+
+def is_bea_table(path):
+    skip = find_header(path)
+    if skip is None:
+        return False
+    with CsvSource(path, skip_lines=skip) as source:
+        return bool(annual_columns(source.header))
+
+def source_files(path):
+    """`path` itself, or every annual BEA table in a directory."""
+    if not os.path.isdir(path):
+        return [path]
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".csv")]
+    tables = [f for f in files if is_bea_table(f)]
+    for skipped in sorted(set(files) - set(tables)):
+        print(f"Skipping {skipped}: not an annual BEA table.")
+    return tables
+
+class Lines:
+    """bea_line ids by (table, line code), created in the database on first use."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        cursor.execute("SELECT table_name, line_code, id FROM bea_line")
+        self.ids = {(table, code): line_id for table, code, line_id in cursor.fetchall()}
+        self.created = 0
+
+    def line_id(self, table, code, description, industry, unit):
+        key = (table, code)
+        if key not in self.ids:
+            self.cursor.execute("""
+                INSERT INTO bea_line (table_name, line_code, description, industry_classification, unit)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (table_name, line_code) DO UPDATE SET
+                    description = EXCLUDED.description,
+                    industry_classification = EXCLUDED.industry_classification,
+                    unit = EXCLUDED.unit
+                RETURNING id
+            """, (table, code, description, industry, unit))
+            self.ids[key] = self.cursor.fetchone()[0]
+            self.created += 1
+        return self.ids[key]
+
+def text_column(batch, i):
+    if i is None or i >= batch.num_columns:
+        return pa.nulls(batch.num_rows, pa.string())
+    text = pc.utf8_trim_whitespace(batch.column(i))
+    return pc.if_else(pc.equal(text, ""), pa.scalar(None, pa.string()), text)
+
+def data_rows(batch, geo_i):
+    """(rows of `batch` up to the footnotes, their geofips, whether the footnotes started)."""
+    # Bulk downloads quote and pad the code: ' "01001"'
+    codes = pc.utf8_trim(pc.fill_null(batch.column(geo_i), ""), ' "')
+    is_data = pc.match_substring_regex(codes, r"^\d+$")
+    if pc.all(is_data).as_py():
+        return batch, pc.utf8_lpad(codes, 5, "0"), False
+    # Footnotes and "Last updated" follow the data
+    end = pc.index(is_data, False).as_py()
+    return batch.slice(0, end), pc.utf8_lpad(codes.slice(0, end), 5, "0"), True
+
+def line_ids(batch, lines, index, default_table):
+    """bea_line id per row, with one lookup per distinct line in the batch."""
+    table_i = index.get("tablename")
+    tables = text_column(batch, table_i) if table_i is not None else pa.array([default_table] * batch.num_rows, pa.string())
+    columns = {
+        "table": tables,
+        "code": pc.cast(text_column(batch, index["linecode"]), pa.int32()),
+        "description": text_column(batch, index["description"]),
+        "industry": text_column(batch, index.get("industryclassification")),
+        "unit": text_column(batch, index.get("unit")),
+    }
+    described = pa.table(columns)
+    ids = {}
+    # "first" keeps the description from the first row of a line, as before
+    for row in described.group_by(["table", "code"], use_threads=False).aggregate(
+        [("description", "first"), ("industry", "first"), ("unit", "first")]
+    ).to_pylist():
+        ids[(row["table"], row["code"])] = lines.line_id(
+            row["table"], row["code"], FOOTNOTE.sub("", row["description_first"] or ""),
+            row["industry_first"], row["unit_first"]
+        )
+    keys = pc.binary_join_element_wise(tables, pc.cast(columns["code"], pa.string()), "|")
+    known = list(ids)
+    lookup = pa.array([f"{table}|{code}" for table, code in known], pa.string())
+    return pa.array([ids[key] for key in known], pa.int32()).take(pc.index_in(keys, value_set=lookup))
+
+def load_bea_file(source, lines, writer, progress, counts, base=0):
+    index = {name.strip().lower(): i for i, name in enumerate(source.header)}
+    years = annual_columns(source.header)
+    default_table = table_name(source)
+
+    for batch in source:
+        batch, geofips, footnotes = data_rows(batch, index["geofips"])
+        counts["processed"] += batch.num_rows
+        progress.update(counts["processed"], base + source.position)
+
+        # Section headings ("Real dollar statistics") carry no line code
+        coded = pc.fill_null(pc.match_substring_regex(pc.utf8_trim_whitespace(batch.column(index["linecode"])), r"^\d+$"), False)
+        counts["headings"] += batch.num_rows - (pc.sum(coded).as_py() or 0)
+        batch = batch.filter(coded)
+        geofips = geofips.filter(coded)
+
+        if batch.num_rows:
+            ids = line_ids(batch, lines, index, default_table)
+            cells = []
+            for i, year in years:
+                values, notes = bea_values(batch.column(i))
+                cell = pa.table({
+                    "line_id": ids,
+                    "geofips": geofips,
+                    "year": pa.array([year] * batch.num_rows, pa.int32()),
+                    "value": values,
+                    "note": notes,
+                })
+                cells.append(cell.filter(pc.or_(pc.is_valid(values), pc.is_valid(notes))))
+            long = pa.concat_tables(cells)
+            counts["suppressed"] += pc.sum(pc.is_null(long["value"])).as_py() or 0
+            write_table(writer, long)
+        if footnotes:
+            break
+
+def write_table(writer, table):
+    if writer.backend == "copy":
+        writer.add_batch(table)
+        return
+    for row in zip(*(column.to_pylist() for column in table.columns)):
+        writer.add(row)
+
+def load_bea(conn, path, backend="copy", batch_size=10000):
+    cursor = conn.cursor()
+    files = source_files(path)
+    if not files:
+        print(f"No annual BEA tables found in {path}")
+        return
+
+    lines = Lines(cursor)
+    writer = UpsertWriter(
+        cursor, "bea_value", ["line_id", "geofips", "year", "value", "note"], ["line_id", "geofips", "year"],
+        backend, batch_size
+    )
+    counts = {"processed": 0, "headings": 0, "suppressed": 0}
+    progress = Progress("bea", sum(os.path.getsize(f) for f in files))
+    done_bytes = 0
+    for file in files:
+        skip = find_header(file)
+        if skip is None:
+            raise ValueError(f"{file} has no GeoFips header line")
+        print(f"Reading {file}...")
+        with CsvBatchSource(file, skip_lines=skip) as source:
+            if not annual_columns(source.header):
+                raise ValueError(f"{file} has no annual year columns")
+            load_bea_file(source, lines, writer, progress, counts, done_bytes)
+            done_bytes += source.size
+            progress.update(counts["processed"], done_bytes)
+
+    inserted, updated = writer.close()
+    # bea_value does not feed soybean_data_view, so data_version (and with
+    # it the export cache and snapshots) stays put
+    conn.commit()
+    progress.done(
+        files=len(files), lines_created=lines.created, suppressed=counts["suppressed"],
+        inserted=inserted, updated=updated
+    )
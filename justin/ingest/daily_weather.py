@@ -0,0 +1,72 @@
+"""County daily weather generated straight from nClimGrid-Daily grids.
+
+County polygons (Census cb_*_us_county_* shapefile, GEOID = 5-digit FIPS) are
+averaged over each day's prcp/tavg/tmax/tmin grids by the nclimgrid package
+and the rows are streamed into the weather COPY writer, with no intermediate
+CSV. Without --start the load resumes the day after the latest weather date,
+so a nightly run only processes new days. Run from the repo root so the
+nclimgrid package is importable.
+"""
+
+import os
+import datetime
+
+from .db import load_cy_ids
+from .datasets import REPO_ROOT, write_weather
+from .progress import Progress
+
+DEFAULT_DAILY_DIR = os.path.join(REPO_ROOT, "noaa_ds", "daily")
+DEFAULT_COUNTIES = os.path.join(REPO_ROOT, "noaa_ds", "us_counties")
+
+def next_weather_date(cursor):
+    # max(date) over the whole table would scan every partition; walk the
+    # years newest first and stop at the first one holding any weather
+    cursor.execute("SELECT DISTINCT year FROM county_year WHERE year IS NOT NULL ORDER BY year DESC")
+    for (year,) in cursor.fetchall():
+        cursor.execute(
+            "SELECT max(date) FROM weather WHERE date >= %s AND date < %s",
+            (datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1))
+        )
+        last = cursor.fetchone()[0]
+        if last:
+            return last + datetime.timedelta(days=1)
+    return None
+
+def load_nclimgrid_daily(conn, path, backend="copy", batch_size=100000, start=None, end=None, counties=None):
+    import geopandas as gpd
+    from nclimgrid.daily import iter_daily_rows
+
+    cursor = conn.cursor()
+    start = start or next_weather_date(cursor)
+    if start is None:
+        raise ValueError("weather is empty; pass --start for the first load")
+    end = end or datetime.date.today() - datetime.timedelta(days=1)
+    if start > end:
+        print(f"Weather is already loaded through {end}.")
+        return
+
+    print(f"Generating county weather for {start} .. {end} from {path}...")
+    cy_ids = load_cy_ids(cursor)
+    zones = gpd.read_file(counties or DEFAULT_COUNTIES)
+    zones["GEOID"] = zones["GEOID"].astype(str).str.zfill(5)
+
+    progress = Progress("nclimgrid")
+    produced = 0
+    skipped = 0
+
+    def records():
+        nonlocal produced, skipped
+        for geofips, day, *measures in iter_daily_rows(path, zones, "GEOID", start, end):
+            produced += 1
+            if produced % 100000 == 0:
+                progress.update(produced)
+            # Like the CSV loader, weather only attaches to existing county_year rows
+            cy_id = cy_ids.get((geofips, day.year))
+            if not cy_id:
+                skipped += 1
+                continue
+            yield (cy_id, day, *measures)
+        progress.update(produced)
+
+    inserted, updated, summarized = write_weather(conn, records(), backend, batch_size)
+    progress.done(inserted=inserted, updated=updated, skipped=skipped, summarized=summarized)
@@ -0,0 +1,308 @@
+import os
+import csv
+
+from .db import load_cy_ids, ensure_cy_ids, ensure_weather_partitions, refresh_weather_summary, commit_load
+from .reader import CsvSource, open_source, is_compressed
+from .progress import Progress
+from .writer import UpsertWriter
+from .resolver import CountyResolver, STATE_ABBR_TO_NAME
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Counties load from the repo's own copy by default, so no network is needed.
+# A download of FIPS_URL can still be passed with --file.
+FIPS_URL = "https://raw.githubusercontent.com/kjhealy/fips-codes/master/state_and_county_fips_master.csv"
+
+MISSING_VALUES = ("", "(NA)", "NA", "(D)")
+
+def parse_value(val):
+    if isinstance(val, (int, float)):
+        return float(val)
+    val = val.strip() if val else ""
+    if val in MISSING_VALUES:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+def parse_years(header):
+    years = []
+    for year_str in header:
+        try:
+            years.append(int(year_str))
+        except ValueError:
+            years.append(None)
+    return years
+
+def unpivot(source, resolver, progress):
+    """Yield (geofips, year, value) from a GeoFIPS,Region,<year>... wide table."""
+    years = parse_years(source.header[2:])
+    for processed, row in enumerate(source, start=1):
+        progress.update(processed, source.position)
+        if not row or len(row) < 3:
+            continue
+
+        # GeoFIPS first ('1001' -> '01001'); Region names only when it is blank
+        geofips = resolver.resolve(row[0], row[1])
+        if geofips is None:
+            continue
+
+        for year, val in zip(years, row[2:]):
+            if year is None:
+                continue
+            value = parse_value(val)
+            if value is not None:
+                yield geofips, year, value
+
+# The BEA region list drops everything after an apostrophe ("O", "St. Mary")
+BEA_NAME_FIXES = {
+    "19141": "O'Brien County",
+    "24033": "Prince George's County",
+    "24035": "Queen Anne's County",
+    "24037": "St. Mary's County",
+}
+
+def read_fips_rows(f):
+    """Yield (geofips, name, state name) for every county in a FIPS list.
+
+    Two layouts are understood: the repo's BEA region list (GeoFIPS,Region,
+    where the SS000 rows name the states) and the fips,name,state master
+    list at FIPS_URL (state as a postal abbreviation, NA on state rows).
+    """
+    reader = csv.reader(f)
+    header = [name.strip() for name in next(reader, [])]
+
+    if header[:2] == ["GeoFIPS", "Region"]:
+        rows = [(row[0].strip().zfill(5), row[1].strip()) for row in reader if len(row) >= 2]
+        states = {fips[:2]: name for fips, name in rows if fips.endswith("000")}
+        for fips, name in rows:
+            if not fips.endswith("000") and fips[:2] in states:
+                yield fips, BEA_NAME_FIXES.get(fips, name), states[fips[:2]]
+        return
+
+    fips_i, name_i, state_i = (header.index(name) for name in ("fips", "name", "state"))
+    for row in reader:
+        abbr = row[state_i].strip()
+        if not abbr or abbr == 'NA':
+            continue
+        # Convert AL → Alabama
+        yield row[fips_i].strip().zfill(5), row[name_i].strip(), STATE_ABBR_TO_NAME.get(abbr, abbr)
+
+def load_counties_dataset(conn, path, backend="copy", batch_size=10000):
+    cursor = conn.cursor()
+    progress = Progress("counties")
+    writer = UpsertWriter(cursor, "county", ["geofips", "name", "state"], ["geofips"], backend, batch_size)
+
+    processed = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in read_fips_rows(f):
+            processed += 1
+            writer.add(row)
+
+    progress.update(processed)
+    inserted, updated = writer.close()
+    commit_load(conn, changed=bool(inserted or updated))
+    progress.done(inserted=inserted, updated=updated)
+
+def load_agricultural(conn, path, backend="copy", batch_size=10000, offset=0, end=None):
+    cursor = conn.cursor()
+    resolver = CountyResolver.from_cursor(cursor)
+
+    values = {}
+    with open_source(path, offset, end) as source:
+        progress = Progress("agricultural", source.size)
+        for geofips, year, value in unpivot(source, resolver, progress):
+            values[(geofips, year)] = value
+
+    cy_ids, created = ensure_cy_ids(cursor, list(values))
+    print(f"Created {created} county_year rows.")
+
+    writer = UpsertWriter(
+        cursor, "agricultural", ["county_year_id", "soybean_total_production"], ["county_year_id"],
+        backend, batch_size, checksums=True
+    )
+    for pair, value in values.items():
+        if pair in cy_ids:
+            writer.add((cy_ids[pair], value))
+
+    inserted, updated = writer.close()
+    commit_load(conn, changed=bool(created or inserted or updated))
+    progress.done(inserted=inserted, updated=updated)
+
+def load_economy(conn, path, backend="copy", batch_size=10000, offset=0, end=None):
+    cursor = conn.cursor()
+    resolver = CountyResolver.from_cursor(cursor)
+    # Economy only attaches to county_year rows that already exist
+    cy_ids = load_cy_ids(cursor)
+
+    writer = UpsertWriter(
+        cursor, "economy", ["county_year_id", "total_gdp"], ["county_year_id"], backend, batch_size, checksums=True
+    )
+    with open_source(path, offset, end) as source:
+        progress = Progress("economy", source.size)
+        for geofips, year, value in unpivot(source, resolver, progress):
+            cy_id = cy_ids.get((geofips, year))
+            if cy_id:
+                writer.add((cy_id, value))
+
+    inserted, updated = writer.close()
+    commit_load(conn, changed=bool(inserted or updated))
+    progress.done(inserted=inserted, updated=updated)
+
+WEATHER_COLUMNS = ["county_year_id", "date", "precip_mm", "tavg_c", "tmax_c", "tmin_c"]
+WEATHER_KEY = ["county_year_id", "date"]
+# Insert order: by date, so each partition's weather_date_brin ranges stay narrow
+WEATHER_ORDER = ["date", "county_year_id"]
+
+class WeatherParser:
+    """Turns weather_with_geo.csv rows into weather tuples.
+
+    Built once from the county resolver and county_year lookup so it can be
+    shared by the serial loader and pickled into parallel workers. Counties
+    resolve by GeoFIPS, else by county name (and state, if the file has a
+    state column).
+    """
+
+    def __init__(self, resolver, cy_ids, header):
+        self.resolver = resolver
+        self.cy_ids = cy_ids
+
+        index = {name: i for i, name in enumerate(header)}
+        self.columns = [index.get(name) for name in (
+            "GeoFIPS", "county", "state", "date", "precip_mm", "tavg_C", "tmax_C", "tmin_C"
+        )]
+
+    def parse(self, row):
+        """Return a weather tuple for `row`, or None if it cannot be loaded."""
+        fips_i, name_i, state_i, date_i, precip_i, tavg_i, tmax_i, tmin_i = self.columns
+
+        def field(i):
+            return row[i].strip() if i is not None and i < len(row) else ""
+
+        date_str = field(date_i)
+        try:
+            year = int(date_str[:4])
+        except ValueError:
+            return None
+
+        fips = self.resolver.resolve(field(fips_i), field(name_i), field(state_i) or None)
+        cy_id = self.cy_ids.get((fips, year)) if fips else None
+        if not cy_id:
+            return None
+
+        try:
+            measures = [float(v) if v else None for v in (
+                field(precip_i), field(tavg_i), field(tmax_i), field(tmin_i)
+            )]
+        except ValueError:
+            return None
+
+        return (cy_id, date_str, *measures)
+
+def write_weather(conn, records, backend="copy", batch_size=100000):
+    """Upsert weather tuples, refresh their summaries and commit the load.
+
+    Any iterable of WEATHER_COLUMNS tuples can be streamed in, so generated
+    data goes through the same COPY path as weather_with_geo.csv.
+    """
+    cursor = conn.cursor()
+    ensure_weather_partitions(cursor)
+    writer = UpsertWriter(
+        cursor, "weather", WEATHER_COLUMNS, WEATHER_KEY, backend, batch_size, checksums=True, order=WEATHER_ORDER
+    )
+    touched = set()
+    for record in records:
+        touched.add(record[0])
+        writer.add(record)
+
+    inserted, updated = writer.close()
+    # With COPY, only county_years whose rows actually changed need a new summary
+    summarized = refresh_weather_summary(cursor, touched if writer.changed is None else writer.changed)
+    commit_load(conn, changed=bool(inserted or updated))
+    return inserted, updated, summarized
+
+def load_weather(conn, path, backend="copy", batch_size=100000, workers=1, offset=0, end=None):
+    if workers > 1 and is_compressed(path):
+        # Workers split the file into byte ranges, which a compressed stream cannot be
+        print(f"{path} is compressed; loading it in a single process.")
+        workers = 1
+    if workers > 1:
+        if backend != "copy":
+            raise ValueError("Parallel weather loading requires the copy backend")
+        from .parallel import load_weather_parallel
+        return load_weather_parallel(conn, path, workers, batch_size, offset, end)
+    if backend == "copy":
+        try:
+            from .batches import load_weather_batches
+        except ImportError:
+            # Without pyarrow, parse row by row below
+            pass
+        else:
+            return load_weather_batches(conn, path, batch_size, offset, end)
+
+    cursor = conn.cursor()
+    resolver = CountyResolver.from_cursor(cursor)
+    cy_ids = load_cy_ids(cursor)
+
+    processed = 0
+    skipped = 0
+    with CsvSource(path, offset=offset, end=end) as source:
+        progress = Progress("weather", source.size)
+        parser = WeatherParser(resolver, cy_ids, source.header)
+
+        def records():
+            nonlocal processed, skipped
+            for row in source:
+                processed += 1
+                if processed % 10000 == 0:
+                    progress.update(processed, source.position)
+
+                record = parser.parse(row)
+                if record is None:
+                    skipped += 1
+                    continue
+                yield record
+
+            progress.update(processed, source.size)
+
+        inserted, updated, summarized = write_weather(conn, records(), backend, batch_size)
+
+    progress.done(
+        inserted=inserted, updated=updated, skipped=skipped, ambiguous=resolver.stats["ambiguous"],
+        summarized=summarized
+    )
+
+def load_nclimgrid(conn, path, **options):
+    # Imported lazily: only this dataset needs xarray/geopandas
+    from .daily_weather import load_nclimgrid_daily
+    return load_nclimgrid_daily(conn, path, **options)
+
+def load_nass(conn, path, **options):
+    from .nass import load_nass
+    return load_nass(conn, path, **options)
+
+def load_bea(conn, path, **options):
+    from .bea import load_bea
+    return load_bea(conn, path, **options)
+
+# Tables whose merges skip county_years by load_checksum; --force clears them
+CHECKSUM_TABLES = {"agricultural": "agricultural", "economy": "economy", "weather": "weather", "nclimgrid": "weather"}
+
+# Datasets that feed soybean_data_view, and so the export snapshots
+EXPORT_DATASETS = {"counties", "agricultural", "economy", "weather", "nclimgrid"}
+
+# Datasets whose loaders take `offset` and can read just the lines appended
+# to a CSV since the last load, and `end` to leave a half-written last line
+# for the next one
+APPENDABLE = {"agricultural", "economy", "weather"}
+
+DATASETS = {
+    "counties": (load_counties_dataset, os.path.join(REPO_ROOT, "chris", "county_fips.csv")),
+    "agricultural": (load_agricultural, os.path.join(REPO_ROOT, "chris", "pivoted_soybeans.csv")),
+    "economy": (load_economy, os.path.join(REPO_ROOT, "chris", "total_gdp.csv")),
+    "weather": (load_weather, os.path.join(REPO_ROOT, "justin", "weather_with_geo.csv")),
+    "nclimgrid": (load_nclimgrid, os.path.join(REPO_ROOT, "noaa_ds", "daily")),
+    "nass": (load_nass, os.path.join(REPO_ROOT, "nass_data")),
+    "bea": (load_bea, os.path.join(REPO_ROOT, "bea_ds")),
+}
@@ -0,0 +1,102 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+def get_connection():
+    load_dotenv()
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        raise ValueError('DATABASE_URL not found. Make sure .env is loaded correctly.')
+    return psycopg2.connect(url)
+
+def load_cy_ids(cursor):
+    # Preload the whole (county_id, year) -> id mapping in one round trip
+    cursor.execute("SELECT county_id, year, id FROM county_year")
+    return {(county_id, year): cy_id for county_id, year, cy_id in cursor.fetchall()}
+
+def ensure_cy_ids(cursor, pairs):
+    # Create every missing county_year in one statement, then read all ids back
+    county_ids = [county_id for county_id, _ in pairs]
+    years = [year for _, year in pairs]
+    cursor.execute("""
+        INSERT INTO county_year (county_id, year)
+        SELECT * FROM unnest(%s::varchar[], %s::int[])
+        ON CONFLICT (county_id, year) DO NOTHING
+    """, (county_ids, years))
+    created = cursor.rowcount
+
+    cursor.execute("""
+        SELECT cy.county_id, cy.year, cy.id
+        FROM county_year cy
+        JOIN unnest(%s::varchar[], %s::int[]) AS p(county_id, year)
+          ON cy.county_id = p.county_id AND cy.year = p.year
+    """, (county_ids, years))
+    return {(county_id, year): cy_id for county_id, year, cy_id in cursor.fetchall()}, created
+
+def weather_partition(year):
+    return f"weather_{year}"
+
+def weather_is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'weather'::regclass")
+    return cursor.fetchone()[0] == 'p'
+
+def ensure_weather_partitions(cursor, years=None):
+    """Create the yearly weather partitions that do not exist yet.
+
+    Weather rows only attach to existing county_year rows, so by default
+    every county_year year gets a partition. Returns the partitions created;
+    a weather table that has not been migrated to partitions is left alone.
+    """
+    if not weather_is_partitioned(cursor):
+        return []
+    if years is None:
+        cursor.execute("SELECT DISTINCT year FROM county_year WHERE year IS NOT NULL")
+        years = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'weather'::regclass
+    """)
+    existing = {row[0] for row in cursor.fetchall()}
+
+    created = []
+    for year in sorted(set(years)):
+        name = weather_partition(year)
+        if name in existing:
+            continue
+        cursor.execute(f"""
+            CREATE TABLE {name} PARTITION OF weather
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """)
+        created.append(name)
+    return created
+
+def refresh_weather_summary(cursor, cy_ids):
+    """Recompute weather_summary and weather_features for just the county_year ids a load touched."""
+    ids = sorted(cy_ids)
+    cursor.execute("SELECT refresh_weather_summary(%s::int[])", (ids,))
+    refreshed = cursor.fetchone()[0]
+    cursor.execute("SELECT refresh_weather_features(%s::int[])", (ids,))
+    return refreshed
+
+def clear_checksums(cursor, table):
+    """Forget `table`'s load checksums, so the next merge writes every staged county_year."""
+    cursor.execute("DELETE FROM load_checksum WHERE table_name = %s", (table,))
+
+def data_version(cursor):
+    cursor.execute("SELECT version FROM data_version")
+    return cursor.fetchone()[0]
+
+def commit_load(conn, changed=True):
+    """Commit a load together with a data_version bump if it `changed` data.
+
+    The export service polls data_version and drops its cached responses when
+    it changes, so every loader commit that changes data goes through here.
+    A load that changed nothing keeps the version, and with it the caches
+    and export snapshots; loads of tables the export does not read (nass,
+    bea) just commit.
+    """
+    if changed:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE data_version SET version = version + 1, updated_at = now()")
+    conn.commit()
@@ -0,0 +1,119 @@
+"""Load ledger: skip source files that have not changed since the last load.
+
+Every successful file load records the file's size, mtime and SHA-256 in
+load_ledger. On the next run of the same dataset and file:
+
+- same size and mtime, or same hash: the file is skipped outright;
+- the file only grew and its first `file_size` bytes still hash to the
+  recorded hash: only the appended lines are read (CSV sources only);
+- anything else: the whole file is read again, and the writers' per
+  county_year checksums keep unchanged rows out of the merge.
+
+Rows only load against the counties and county_years that exist at the
+time, so the ledger also records the state of those tables; an unchanged
+file is read again once they change (e.g. economy loaded before
+agricultural created its county_years).
+"""
+
+import os
+import hashlib
+
+HASH_BLOCK = 1 << 20
+
+def file_hashes(path, prefix_size=None):
+    """SHA-256 of the whole file and of its first `prefix_size` bytes, in one read."""
+    digest = hashlib.sha256()
+    prefix = None
+    with open(path, 'rb') as f:
+        if prefix_size is not None:
+            remaining = prefix_size
+            while remaining:
+                block = f.read(min(HASH_BLOCK, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+            prefix = digest.copy().hexdigest()
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest(), prefix
+
+def complete_lines_end(path, size):
+    """Offset just past the last newline, so a half-written line is read again next time."""
+    with open(path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(end - HASH_BLOCK, 0)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+def reference_state(cursor):
+    """Summary of the county and county_year tables that rows are resolved against."""
+    cursor.execute("""
+        SELECT (SELECT count(*) FROM county), (SELECT count(*) FROM county_year), (SELECT coalesce(max(id), 0) FROM county_year)
+    """)
+    return "county={} county_year={}/{}".format(*cursor.fetchone())
+
+def plan(cursor, dataset, path, appendable=False, force=False):
+    """Decide how to load `path`: returns (action, offset, fingerprint).
+
+    `action` is "skip", "append" (read from `offset`) or "full";
+    `fingerprint` is what `record()` stores once the load has committed.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cursor.execute("""
+        SELECT file_size, file_mtime_ns, file_hash, last_position, reference_state
+        FROM load_ledger WHERE dataset = %s AND source = %s
+    """, (dataset, path))
+    last = cursor.fetchone()
+    if last and last[4] != reference_state(cursor):
+        # Rows dropped for a missing county or county_year may load now
+        force = True
+
+    if last and not force and (last[0], last[1]) == (stat.st_size, stat.st_mtime_ns):
+        return "skip", 0, None
+
+    grew = last is not None and stat.st_size > last[0]
+    file_hash, prefix_hash = file_hashes(path, last[0] if grew else None)
+    fingerprint = {
+        "source": path,
+        "file_size": stat.st_size,
+        "file_mtime_ns": stat.st_mtime_ns,
+        "file_hash": file_hash,
+        "last_position": complete_lines_end(path, stat.st_size) if appendable else stat.st_size,
+    }
+
+    if force or last is None:
+        return "full", 0, fingerprint
+    if file_hash == last[2]:
+        # Touched but not changed: just remember the new mtime
+        return "skip", 0, fingerprint
+    if appendable and grew and prefix_hash == last[2]:
+        return "append", last[3], fingerprint
+    return "full", 0, fingerprint
+
+def record(conn, dataset, fingerprint):
+    with conn.cursor() as cursor:
+        # Taken after the load, which may itself have created county_years
+        state = reference_state(cursor)
+        cursor.execute("""
+            INSERT INTO load_ledger (dataset, source, file_size, file_mtime_ns, file_hash, last_position, reference_state)
+            VALUES (
+                %(dataset)s, %(source)s, %(file_size)s, %(file_mtime_ns)s, %(file_hash)s, %(last_position)s,
+                %(reference_state)s
+            )
+            ON CONFLICT (dataset, source) DO UPDATE SET
+                file_size = EXCLUDED.file_size,
+                file_mtime_ns = EXCLUDED.file_mtime_ns,
+                file_hash = EXCLUDED.file_hash,
+                last_position = EXCLUDED.last_position,
+                reference_state = EXCLUDED.reference_state,
+                loaded_at = now()
+        """, dict(fingerprint, dataset=dataset, reference_state=state))
+    conn.commit()
@@ -0,0 +1,151 @@
+"""NASS Quick Stats exports (nass_data/*_yield.csv) for any commodity.
+
+Quick Stats rows are long format: one value per program, geography, year
+and data item. Rows outside the requested geo levels are dropped while the
+file is parsed. The remaining rows are dictionary-encoded against
+nass_commodity / nass_item and COPYed into the nass_value fact table. Each
+fact is keyed by a 5-digit geofips: the county FIPS for COUNTY rows and
+SS000 for STATE rows, the same convention as the BEA tables.
+"""
+
+import os
+
+from .reader import CsvSource
+from .progress import Progress
+from .writer import UpsertWriter
+
+GEO_LEVELS = ("COUNTY", "STATE")
+
+# Quick Stats suppression / flag markers: withheld, less than half the unit,
+# not available, not applicable, and the CV (%) low/high flags
+NASS_MISSING = ("", "(D)", "(Z)", "(NA)", "(X)", "(S)", "(L)", "(H)")
+
+ITEM_COLUMNS = ("Program", "Period", "Data Item", "Domain Category")
+
+def parse_nass_number(val):
+    val = val.strip().replace(",", "")
+    if val in NASS_MISSING:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+def nass_geofips(level, state_ansi, county_ansi):
+    state_ansi = state_ansi.strip()
+    if not state_ansi:
+        return None
+    if level == "STATE":
+        return state_ansi.zfill(2) + "000"
+    county_ansi = county_ansi.strip()
+    # "OTHER (COMBINED) COUNTIES" rows have no county code
+    if not county_ansi:
+        return None
+    return state_ansi.zfill(2) + county_ansi.zfill(3)
+
+def is_quick_stats(path):
+    with CsvSource(path) as source:
+        return all(name in source.header for name in ("Geo Level", "Commodity", "Data Item", "Value"))
+
+def source_files(path):
+    """`path` itself, or every Quick Stats CSV in a directory."""
+    if not os.path.isdir(path):
+        return [path]
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".csv")]
+    return [f for f in files if is_quick_stats(f)]
+
+class Dimensions:
+    """Commodity and data item ids, created in the database on first use."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        cursor.execute("SELECT name, id FROM nass_commodity")
+        self.commodities = dict(cursor.fetchall())
+        cursor.execute("SELECT commodity_id, program, period, data_item, domain_category, id FROM nass_item")
+        self.items = {tuple(row[:5]): row[5] for row in cursor.fetchall()}
+        self.created = 0
+
+    def commodity_id(self, name):
+        if name not in self.commodities:
+            self.cursor.execute("""
+                INSERT INTO nass_commodity (name) VALUES (%s)
+                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                RETURNING id
+            """, (name,))
+            self.commodities[name] = self.cursor.fetchone()[0]
+        return self.commodities[name]
+
+    def item_id(self, commodity, program, period, data_item, domain_category):
+        key = (self.commodity_id(commodity), program, period, data_item, domain_category)
+        if key not in self.items:
+            self.cursor.execute("""
+                INSERT INTO nass_item (commodity_id, program, period, data_item, domain_category)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (commodity_id, program, period, data_item, domain_category)
+                DO UPDATE SET data_item = EXCLUDED.data_item
+                RETURNING id
+            """, key)
+            self.items[key] = self.cursor.fetchone()[0]
+            self.created += 1
+        return self.items[key]
+
+def load_nass_file(source, dims, writer, levels, progress, counts, base=0):
+    (level_i, state_i, county_i, year_i, commodity_i, value_i, cv_i,
+     program_i, period_i, item_i, category_i) = source.columns(
+        "Geo Level", "State ANSI", "County ANSI", "Year", "Commodity", "Value", "CV (%)", *ITEM_COLUMNS
+    )
+    for row in source:
+        counts["processed"] += 1
+        if counts["processed"] % 10000 == 0:
+            progress.update(counts["processed"], base + source.position)
+
+        level = row[level_i]
+        if level not in levels:
+            counts["filtered"] += 1
+            continue
+
+        geofips = nass_geofips(level, row[state_i], row[county_i] if county_i is not None else "")
+        value = parse_nass_number(row[value_i])
+        if geofips is None or value is None:
+            counts["skipped"] += 1
+            continue
+
+        item_id = dims.item_id(
+            row[commodity_i], row[program_i], row[period_i], row[item_i].strip(), row[category_i].strip()
+        )
+        cv = parse_nass_number(row[cv_i]) if cv_i is not None else None
+        writer.add((item_id, geofips, int(row[year_i]), value, cv))
+
+def load_nass(conn, path, backend="copy", batch_size=10000, geo_levels=GEO_LEVELS):
+    cursor = conn.cursor()
+    if isinstance(geo_levels, str):
+        geo_levels = geo_levels.split(",")
+    levels = {level.strip().upper() for level in geo_levels}
+    files = source_files(path)
+    if not files:
+        print(f"No NASS Quick Stats CSV files found in {path}")
+        return
+
+    dims = Dimensions(cursor)
+    writer = UpsertWriter(
+        cursor, "nass_value", ["item_id", "geofips", "year", "value", "cv_pct"], ["item_id", "geofips", "year"],
+        backend, batch_size
+    )
+    counts = {"processed": 0, "filtered": 0, "skipped": 0}
+    progress = Progress("nass", sum(os.path.getsize(f) for f in files))
+    done_bytes = 0
+    for file in files:
+        print(f"Reading {file}...")
+        with CsvSource(file) as source:
+            load_nass_file(source, dims, writer, levels, progress, counts, done_bytes)
+            done_bytes += source.size
+            progress.update(counts["processed"], done_bytes)
+
+    inserted, updated = writer.close()
+    # nass_value does not feed soybean_data_view, so data_version (and with
+    # it the export cache and snapshots) stays put
+    conn.commit()
+    progress.done(
+        files=len(files), items_created=dims.created, filtered=counts["filtered"], skipped=counts["skipped"],
+        inserted=inserted, updated=updated
+    )
@@ -0,0 +1,144 @@
+"""Parallel weather ingestion.
+
+The source file is split into byte ranges aligned to line starts. Each worker
+process parses its range with its own connection and COPYs into one shared
+UNLOGGED staging table; the parent then merges the stage into `weather` with
+a single set-based upsert, so workers never contend on `weather` itself.
+Ranges are cut on raw newlines, so quoted fields must not contain line breaks
+(weather_with_geo.csv has none).
+"""
+
+import os
+import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .db import get_connection, load_cy_ids, ensure_weather_partitions, refresh_weather_summary, commit_load
+from .datasets import WeatherParser, WEATHER_COLUMNS, WEATHER_KEY, WEATHER_ORDER
+from .progress import Progress
+from .writer import UpsertWriter, create_stage
+from .resolver import CountyResolver
+
+STAGE = "weather_load_stage"
+
+# Rows from range i get stage_seq values starting at i << SEQ_SHIFT, so the
+# merge still lets later rows in the file win over earlier ones.
+SEQ_SHIFT = 40
+
+_parser = None
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        line = f.readline()
+        return next(csv.reader([line.decode('utf-8')]), []), f.tell()
+
+def split_ranges(path, parts, data_start, end=None):
+    """Split [data_start, end or EOF) into at most `parts` line-aligned byte ranges."""
+    size = os.path.getsize(path) if end is None else end
+    step = max((size - data_start) // parts, 1)
+    bounds = [data_start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            target = data_start + i * step
+            if target <= bounds[-1] or target >= size:
+                continue
+            # Back up one byte so a boundary already on a line start stays put
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() > bounds[-1] and f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def iter_lines(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+def _init_worker(resolver, cy_ids, header):
+    global _parser
+    _parser = WeatherParser(resolver, cy_ids, header)
+
+def _load_range(path, index, start, end, batch_size):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        writer = UpsertWriter(
+            cursor, "weather", WEATHER_COLUMNS, WEATHER_KEY, "copy", batch_size,
+            stage=STAGE, seq_offset=index << SEQ_SHIFT
+        )
+        processed = 0
+        skipped = 0
+        for row in csv.reader(iter_lines(path, start, end)):
+            processed += 1
+            record = _parser.parse(row)
+            if record is None:
+                skipped += 1
+                continue
+            writer.add(record)
+        writer.close(merge=False)
+        conn.commit()
+        ambiguous = _parser.resolver.stats["ambiguous"]
+        _parser.resolver.stats.clear()
+        return index, processed, writer.written, skipped, ambiguous, end - start
+    finally:
+        conn.close()
+
+def load_weather_parallel(conn, path, workers, batch_size=100000, offset=0, end=None):
+    cursor = conn.cursor()
+    resolver = CountyResolver.from_cursor(cursor)
+    cy_ids = load_cy_ids(cursor)
+
+    header, data_start = read_header(path)
+    data_start = max(data_start, offset)
+    # A few ranges per worker keeps the pool busy when ranges parse unevenly
+    ranges = split_ranges(path, workers * 4, data_start, end)
+
+    ensure_weather_partitions(cursor)
+    cursor.execute(f"DROP TABLE IF EXISTS {STAGE}")
+    create_stage(cursor, "weather", WEATHER_COLUMNS, STAGE, temporary=False)
+    conn.commit()
+
+    progress = Progress("weather", (os.path.getsize(path) if end is None else end) - data_start)
+    print(f"Loading {len(ranges)} ranges with {workers} workers...")
+
+    processed = staged = skipped = ambiguous = done_bytes = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(resolver, cy_ids, header)
+        ) as pool:
+            futures = [
+                pool.submit(_load_range, path, i, start, end, batch_size)
+                for i, (start, end) in enumerate(ranges)
+            ]
+            for future in as_completed(futures):
+                _, rows, written, bad, unclear, nbytes = future.result()
+                processed += rows
+                staged += written
+                skipped += bad
+                ambiguous += unclear
+                done_bytes += nbytes
+                progress.update(processed, done_bytes)
+
+        print(f"Merging {staged:,} staged rows into weather...")
+        writer = UpsertWriter(
+            cursor, "weather", WEATHER_COLUMNS, WEATHER_KEY, "copy", stage=STAGE, checksums=True, order=WEATHER_ORDER
+        )
+        writer.merge()
+        summarized = refresh_weather_summary(cursor, writer.changed)
+        cursor.execute(f"DROP TABLE {STAGE}")
+        commit_load(conn, changed=bool(writer.inserted or writer.updated))
+    except Exception:
+        conn.rollback()
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGE}")
+        conn.commit()
+        raise
+
+    progress.done(
+        workers=workers, ranges=len(ranges), staged=staged,
+        inserted=writer.inserted, updated=writer.updated, skipped=skipped,
+        ambiguous=ambiguous, summarized=summarized
+    )
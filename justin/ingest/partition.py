@@ -0,0 +1,108 @@
+"""Move an existing unpartitioned weather table into yearly partitions.
+
+    python -m justin.ingest.partition [--keep-old]
+
+Everything runs in one transaction. The old table is renamed to
+weather_unpartitioned, and the partitioned weather table, its BRIN index and
+refresh_weather_summary() are created from schema.sql. Rows are then copied
+one year at a time in date order, which keeps each partition's BRIN ranges
+tight. Other sessions touching weather wait until the commit.
+"""
+
+import os
+import re
+import time
+import argparse
+
+from .db import get_connection, weather_is_partitioned, ensure_weather_partitions
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schema.sql")
+
+OLD = "weather_unpartitioned"
+
+# Statements taken verbatim from schema.sql, so the migrated table matches a fresh one
+SCHEMA_STATEMENTS = (
+    r"^CREATE TABLE weather \(.*?^\) PARTITION BY RANGE \(date\);",
+    r"^CREATE INDEX weather_date_brin .*?;",
+    r"^CREATE OR REPLACE FUNCTION refresh_weather_summary\(.*?^\$\$ LANGUAGE plpgsql;",
+)
+
+COLUMNS = "county_year_id, date, precip_mm, tavg_c, tmax_c, tmin_c"
+
+def schema_statements(path=SCHEMA):
+    with open(path, encoding="utf-8") as f:
+        schema = f.read()
+    statements = []
+    for pattern in SCHEMA_STATEMENTS:
+        match = re.search(pattern, schema, re.S | re.M)
+        if not match:
+            raise ValueError(f"{path} has no statement matching {pattern!r}")
+        statements.append(match.group(0))
+    return statements
+
+def rename_old_table(cursor):
+    cursor.execute(f"ALTER TABLE weather RENAME TO {OLD}")
+    # Index names are schema-wide, so free weather_pkey & co. for the new table
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (OLD,))
+    for (name,) in cursor.fetchall():
+        if name.startswith("weather_"):
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {OLD}_{name[len('weather_'):]}")
+
+def migrate(conn, keep_old=False):
+    cursor = conn.cursor()
+    if weather_is_partitioned(cursor):
+        print("weather is already partitioned.")
+        return
+
+    statements = schema_statements()
+    start = time.monotonic()
+    rename_old_table(cursor)
+    for statement in statements:
+        cursor.execute(statement)
+
+    cursor.execute(f"SELECT DISTINCT EXTRACT(YEAR FROM date)::int FROM {OLD} ORDER BY 1")
+    years = [row[0] for row in cursor.fetchall()]
+    created = ensure_weather_partitions(cursor, years)
+    print(f"Created {len(created)} partitions ({years[0] if years else '-'} .. {years[-1] if years else '-'}).")
+
+    moved = 0
+    for year in years:
+        cursor.execute(f"""
+            INSERT INTO weather ({COLUMNS})
+            SELECT {COLUMNS} FROM {OLD}
+            WHERE date >= %s AND date < %s AND county_year_id IS NOT NULL
+            ORDER BY date, county_year_id
+        """, (f"{year}-01-01", f"{year + 1}-01-01"))
+        moved += cursor.rowcount
+        print(f"{year}: {cursor.rowcount:,} rows ({moved:,} total, {time.monotonic() - start:.1f}s)")
+
+    cursor.execute(f"SELECT COUNT(*) FROM {OLD}")
+    total = cursor.fetchone()[0]
+    if total != moved:
+        print(f"Skipped {total - moved:,} rows without a county_year_id.")
+
+    if not keep_old:
+        cursor.execute(f"DROP TABLE {OLD}")
+    conn.commit()
+
+    cursor.execute("ANALYZE weather")
+    conn.commit()
+    kept = f" The old table is kept as {OLD}." if keep_old else ""
+    print(f"Moved {moved:,} weather rows into {len(years)} partitions in {time.monotonic() - start:.1f}s.{kept}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m justin.ingest.partition", description="Migrate weather to yearly range partitions.")
+    parser.add_argument("--keep-old", action="store_true", help=f"Keep the original table as {OLD} instead of dropping it")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        migrate(conn, args.keep_old)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
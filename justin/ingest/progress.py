@@ -0,0 +1,36 @@
+import time
+
+class Progress:
+    """Single-pass progress and throughput reporter.
+
+    Percentages come from the byte position in the source file, so the file
+    never has to be read twice just to count lines.
+    """
+
+    def __init__(self, label, total_bytes=None):
+        self.label = label
+        self.total_bytes = total_bytes
+        self.rows = 0
+        self.start = time.monotonic()
+        self.last_percent = -1
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed else 0
+
+    def update(self, rows, position=None):
+        self.rows = rows
+        if not self.total_bytes or position is None:
+            return
+        percent = min(int(position / self.total_bytes * 100), 100)
+        if percent > self.last_percent:
+            print(f"{self.label}: {percent}% ({self.rows:,} rows, {self.rate():,.0f} rows/sec)")
+            self.last_percent = percent
+
+    def done(self, **counts):
+        details = ", ".join(f"{key}: {value:,}" for key, value in counts.items())
+        suffix = f" {details}." if details else ""
+        print(f"{self.label}: done. {self.rows:,} rows in {self.elapsed():.1f}s ({self.rate():,.0f} rows/sec).{suffix}")
@@ -0,0 +1,212 @@
+import io
+import os
+import csv
+import gzip
+
+COMPRESSED = (".gz", ".zst")
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED)
+
+def open_stream(path):
+    """(raw file, binary stream) for `path`; .gz and .zst are decompressed on the fly.
+
+    Positions are taken from the raw file, so progress counts compressed
+    bytes, the same unit as the file size on disk.
+    """
+    if path.endswith(".zst"):
+        import pyarrow as pa
+        raw = pa.OSFile(path)
+        return raw, io.BufferedReader(pa.CompressedInputStream(raw, "zstd"))
+    raw = open(path, 'rb')
+    if path.endswith(".gz"):
+        return raw, gzip.GzipFile(fileobj=raw)
+    return raw, raw
+
+class BoundedReader(io.RawIOBase):
+    """Reads the binary file `f` from where it is up to byte `end`."""
+
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.end - self.f.tell())
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        buffer[:len(data)] = data
+        return len(data)
+
+class CsvSource:
+    """Streams a CSV file once, exposing the header and the byte position.
+
+    A non-zero `offset` (a line start, e.g. the ledger's last position) skips
+    straight to the rows appended after it; the header is still read first.
+    `end` stops reading at that byte, e.g. before a half-written last line.
+    `skip_lines` title lines before the header (as in BEA tables) are kept
+    in `preamble`. Compressed files (.gz, .zst) are read as a stream and
+    cannot be resumed from an offset or cut at `end`.
+    """
+
+    def __init__(self, path, encoding='utf-8', offset=0, skip_lines=0, end=None):
+        self.path = path
+        self.encoding = encoding
+        self.offset = offset
+        self.end = end
+        self.skip_lines = skip_lines
+        self.size = os.path.getsize(path) if end is None else end
+        self.preamble = []
+        self.header = []
+        self._raw = None
+        self._stream = None
+        self._reader = None
+
+    def _open(self):
+        self._raw, self._stream = open_stream(self.path)
+        self.preamble = [self._stream.readline().decode(self.encoding).strip() for _ in range(self.skip_lines)]
+        self.header = next(csv.reader([self._stream.readline().decode(self.encoding)]), [])
+        if self._stream is not self._raw:
+            if self.offset:
+                raise ValueError(f"Cannot resume compressed file {self.path} at byte {self.offset}")
+            if self.end is not None:
+                raise ValueError(f"Cannot stop compressed file {self.path} at byte {self.end}")
+        if self.offset > self._raw.tell():
+            self._raw.seek(self.offset)
+        if self.end is not None:
+            self._stream = io.BufferedReader(BoundedReader(self._raw, self.end))
+
+    def __enter__(self):
+        self._open()
+        text = io.TextIOWrapper(self._stream, encoding=self.encoding, newline='')
+        self._reader = csv.reader(text)
+        return self
+
+    def __exit__(self, *exc):
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+
+    def __iter__(self):
+        return self._reader
+
+    @property
+    def position(self):
+        # Position of the underlying binary file; the text layer reads ahead
+        # in chunks, which is plenty accurate for progress reporting.
+        return self._raw.tell()
+
+    def columns(self, *names):
+        """Return the header index of each name (None when missing)."""
+        index = {name: i for i, name in enumerate(self.header)}
+        return [index.get(name) for name in names]
+
+class CsvBatchSource(CsvSource):
+    """Streams a CSV file as Arrow record batches instead of rows.
+
+    Same single pass, header, offset, compression and byte position as
+    CsvSource, but the file is read `block_size` bytes at a time (extended
+    to the end of the line) and each block is split and converted by
+    pyarrow's CSV parser, so only one block is held in memory and
+    `position` stays exact. Quoted fields must not contain line breaks.
+    `column_types` maps column names to Arrow types (anything else stays a
+    string) and empty fields are nulls. Rows with the wrong number of
+    fields are skipped and counted in `invalid`.
+    """
+
+    def __init__(self, path, column_types=None, encoding='utf-8', offset=0, block_size=1 << 20, skip_lines=0, end=None):
+        super().__init__(path, encoding, offset, skip_lines, end)
+        self.column_types = column_types or {}
+        self.block_size = block_size
+        self.invalid = 0
+
+    def _invalid_row(self, row):
+        self.invalid += 1
+        return "skip"
+
+    def __enter__(self):
+        import pyarrow as pa
+        import pyarrow.csv as pv
+        self._open()
+        self._options = {
+            # Larger than any block, so each block parses to a single batch
+            "read_options": pv.ReadOptions(
+                column_names=self.header, block_size=2 * self.block_size, use_threads=False, encoding=self.encoding
+            ),
+            "parse_options": pv.ParseOptions(invalid_row_handler=self._invalid_row),
+            "convert_options": pv.ConvertOptions(
+                column_types={name: self.column_types.get(name, pa.string()) for name in self.header},
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        }
+        return self
+
+    def __iter__(self):
+        import pyarrow as pa
+        import pyarrow.csv as pv
+        while True:
+            block = self._stream.read(self.block_size)
+            if not block:
+                return
+            if not block.endswith(b"\n"):
+                block += self._stream.readline()
+            yield from pv.read_csv(pa.py_buffer(block), **self._options).to_batches()
+
+class ParquetSource:
+    """Row iterator over a Parquet file with the same interface as CsvSource.
+
+    Values keep their Parquet types (ints, floats, None) instead of strings.
+    Progress is tracked in rows: `size` is the row count and `position` the
+    number of rows read so far.
+    """
+
+    def __init__(self, path, batch_size=65536):
+        import pyarrow.parquet as pq
+        self.path = path
+        self.batch_size = batch_size
+        self._file = pq.ParquetFile(path)
+        self.size = self._file.metadata.num_rows
+        self.header = self._file.schema_arrow.names
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def __iter__(self):
+        for batch in self._file.iter_batches(batch_size=self.batch_size):
+            columns = [col.to_pylist() for col in batch.columns]
+            for row in zip(*columns):
+                self.position += 1
+                yield row
+
+    def columns(self, *names):
+        index = {name: i for i, name in enumerate(self.header)}
+        return [index.get(name) for name in names]
+
+def open_source(path, offset=0, end=None):
+    """CsvSource or ParquetSource, by file extension (CSVs may be .gz / .zst)."""
+    if path.endswith(".parquet"):
+        return ParquetSource(path)
+    return CsvSource(path, offset=offset, end=end)
+
+def prefer_parquet(path):
+    """The Parquet sibling of a .csv path (as written by chris/dataloading.py), if present.
+
+    Otherwise a missing .csv falls back to a compressed copy (.csv.gz, .csv.zst).
+    """
+    if path and path.endswith(".csv"):
+        parquet = path[:-len(".csv")] + ".parquet"
+        if os.path.exists(parquet):
+            return parquet
+        if not os.path.exists(path):
+            for ext in COMPRESSED:
+                if os.path.exists(path + ext):
+                    return path + ext
+    return path
@@ -0,0 +1,278 @@
+"""County resolution shared by every loader.
+
+Source files identify counties by FIPS (often mangled: 1001, 1001.0, " 01001"),
+by name ("Autauga", "Autauga County", "St. Mary's Parish", "Baltimore city"),
+or by name plus state. CountyResolver turns any of these into the 5-digit
+geofips of the county table, using an index built once from that table:
+
+- every geofips;
+- (state FIPS, normalized full name), e.g. ("24", "baltimore city");
+- (state FIPS, normalized base name without County/Parish/Borough/...),
+  and the same base name across all states.
+
+A base name that matches several counties resolves only if exactly one of
+them is a County (the old "<name> County" rule); otherwise it is reported as
+ambiguous rather than guessed. Names are only used when no FIPS code is
+given, so state and national rows never resolve to a county, and a state
+that doesn't resolve leaves its rows unresolved too.
+
+Results are memoized per distinct input, so resolving a column costs one
+dict lookup per row; resolve_columns resolves whole Arrow columns with one
+lookup per distinct value. The index is pickled to disk, keyed by a checksum of
+the county table, and reused until the table changes.
+"""
+
+import os
+import re
+import pickle
+import unicodedata
+from collections import Counter
+
+STATE_ABBR_TO_NAME = {
+    "AL": "Alabama",
+    "AK": "Alaska",
+    "AZ": "Arizona",
+    "AR": "Arkansas",
+    "CA": "California",
+    "CO": "Colorado",
+    "CT": "Connecticut",
+    "DE": "Delaware",
+    "DC": "District of Columbia",
+    "FL": "Florida",
+    "GA": "Georgia",
+    "HI": "Hawaii",
+    "ID": "Idaho",
+    "IL": "Illinois",
+    "IN": "Indiana",
+    "IA": "Iowa",
+    "KS": "Kansas",
+    "KY": "Kentucky",
+    "LA": "Louisiana",
+    "ME": "Maine",
+    "MD": "Maryland",
+    "MA": "Massachusetts",
+    "MI": "Michigan",
+    "MN": "Minnesota",
+    "MS": "Mississippi",
+    "MO": "Missouri",
+    "MT": "Montana",
+    "NE": "Nebraska",
+    "NV": "Nevada",
+    "NH": "New Hampshire",
+    "NJ": "New Jersey",
+    "NM": "New Mexico",
+    "NY": "New York",
+    "NC": "North Carolina",
+    "ND": "North Dakota",
+    "OH": "Ohio",
+    "OK": "Oklahoma",
+    "OR": "Oregon",
+    "PA": "Pennsylvania",
+    "RI": "Rhode Island",
+    "SC": "South Carolina",
+    "SD": "South Dakota",
+    "TN": "Tennessee",
+    "TX": "Texas",
+    "UT": "Utah",
+    "VT": "Vermont",
+    "VA": "Virginia",
+    "WA": "Washington",
+    "WV": "West Virginia",
+    "WI": "Wisconsin",
+    "WY": "Wyoming"
+}
+
+# County-equivalent suffixes, longest first so "city and borough" wins over "borough"
+SUFFIXES = (
+    "city and borough", "census area", "planning region", "municipality",
+    "municipio", "borough", "parish", "county", "city",
+)
+
+# Bump when normalization changes, so stale pickles are not reused
+INDEX_VERSION = 1
+
+CACHE_DIR = os.getenv(
+    "INGEST_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache"),
+)
+
+# Joins the fields of a row into one key in resolve_columns
+COLUMN_SEP = "\x1f"
+
+def normalize_name(name):
+    """Lowercase ASCII words: "St. Mary's Parish" -> "st marys parish"."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    name = name.replace("&", " and ").replace(".", "").replace("'", "")
+    name = re.sub(r"[^a-z0-9]+", " ", name).strip()
+    name = re.sub(r"^saint\b", "st", name)
+    return re.sub(r"^sainte\b", "ste", name)
+
+def split_suffix(normalized):
+    """("st marys", "parish") from "st marys parish"; suffix is "" if none."""
+    for suffix in SUFFIXES:
+        if normalized.endswith(" " + suffix):
+            return normalized[:-len(suffix) - 1], suffix
+    return normalized, ""
+
+def normalize_fips(value):
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:
+            return None
+        value = int(value)
+    text = str(value).strip().split(".")[0]
+    if not text.isdigit():
+        return None
+    return text.zfill(5)
+
+class CountyResolver:
+    """FIPS / name / state -> geofips lookups over the county table."""
+
+    def __init__(self, county_rows):
+        """`county_rows` are (geofips, name, state name) tuples."""
+        self.fips = set()
+        self.exact = {}
+        self.base = {}
+        self.base_any = {}
+        self.states = {}
+        for geofips, name, state in county_rows:
+            self.fips.add(geofips)
+            state_fips = geofips[:2]
+            if state:
+                self.states[normalize_name(state)] = state_fips
+            full = normalize_name(name)
+            base, suffix = split_suffix(full)
+            self.exact[(state_fips, full)] = geofips
+            self.base.setdefault((state_fips, base), []).append((geofips, suffix))
+            self.base_any.setdefault(base, []).append((geofips, suffix))
+        for abbr, state in STATE_ABBR_TO_NAME.items():
+            if normalize_name(state) in self.states:
+                self.states[abbr.lower()] = self.states[normalize_name(state)]
+        self.stats = Counter()
+        self._memo = {}
+
+    @classmethod
+    def from_cursor(cls, cursor, cache_dir=CACHE_DIR):
+        """Build (or load the cached) resolver for the current county table."""
+        cursor.execute("""
+            SELECT md5(COALESCE(string_agg(geofips || '|' || name || '|' || state, E'\\n' ORDER BY geofips), ''))
+            FROM county
+        """)
+        path = os.path.join(cache_dir, f"county_index-v{INDEX_VERSION}-{cursor.fetchone()[0]}.pickle")
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+            except Exception as e:
+                # Truncated, or pickled by an older version of this class
+                print(f"Rebuilding the county index, could not load {path}: {e}")
+
+        cursor.execute("SELECT geofips, name, state FROM county")
+        resolver = cls(cursor.fetchall())
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            for old in os.listdir(cache_dir):
+                if old.startswith("county_index-"):
+                    os.remove(os.path.join(cache_dir, old))
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(resolver, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            # A read-only checkout still works, just without the cache
+            print(f"Could not cache the county index in {cache_dir}: {e}")
+        return resolver
+
+    def state_fips(self, state):
+        if state is None:
+            return None
+        text = str(state).strip()
+        if text.isdigit():
+            return text.zfill(2)
+        return self.states.get(normalize_name(text))
+
+    @staticmethod
+    def _pick(matches):
+        if len(matches) == 1:
+            return matches[0][0]
+        counties = [geofips for geofips, suffix in matches if suffix == "county"]
+        return counties[0] if len(counties) == 1 else None
+
+    def _resolve(self, fips, name, state):
+        geofips = normalize_fips(fips)
+        if geofips in self.fips:
+            return geofips, "fips"
+        if geofips is not None:
+            # A real code that is not a county (a state or US total row) must
+            # not fall back to its name: "Texas" would match Texas County, MO
+            return None, "unknown"
+
+        if name is None or not str(name).strip():
+            return None, "unknown"
+        name = str(name)
+        if state is not None and str(state).strip() and self.state_fips(state) is None:
+            # A state we don't know ("Guam", a typo) must not widen the
+            # search to every state's counties
+            return None, "unknown"
+        if state is None and "," in name:
+            # "Autauga, AL" / "Baltimore city, MD"
+            name, state = name.rsplit(",", 1)
+        state_fips = self.state_fips(state)
+        full = normalize_name(name)
+        base, _ = split_suffix(full)
+
+        if state_fips:
+            if (state_fips, full) in self.exact:
+                return self.exact[(state_fips, full)], "name"
+            matches = self.base.get((state_fips, base), [])
+        else:
+            matches = self.base_any.get(base, [])
+            if len(matches) > 1:
+                # An explicit suffix ("Baltimore city") may still pick one out
+                exact = [m for m in matches if self.exact.get((m[0][:2], full)) == m[0]]
+                if len(exact) == 1:
+                    return exact[0][0], "name"
+
+        if not matches:
+            return None, "unknown"
+        geofips = self._pick(matches)
+        return (geofips, "name") if geofips else (None, "ambiguous")
+
+    def resolve(self, fips=None, name=None, state=None, count=1):
+        """geofips for one (fips, name, state), or None; memoized per input.
+
+        `count` is how many rows share this input, for the stats.
+        """
+        key = (fips, name, state)
+        if key not in self._memo:
+            self._memo[key] = self._resolve(fips, name, state)
+        geofips, how = self._memo[key]
+        self.stats[how] += count
+        return geofips
+
+    def resolve_columns(self, fips, names, states):
+        """Resolve Arrow string columns at once; returns a geofips column.
+
+        The inputs are dictionary-encoded, so each distinct (fips, name,
+        state) is resolved once and the results are taken back out to the
+        rows by index. Nulls stand for blank fields.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        keys = pc.binary_join_element_wise(fips, names, states, COLUMN_SEP, null_handling="replace")
+        encoded = pc.dictionary_encode(keys)
+        counts = {item["values"]: item["counts"] for item in pc.value_counts(encoded.indices).to_pylist()}
+        resolved = []
+        for i, key in enumerate(encoded.dictionary.to_pylist()):
+            fips_value, name, state = key.split(COLUMN_SEP)
+            resolved.append(self.resolve(fips_value, name, state or None, count=counts.get(i, 0)))
+        return pa.array(resolved, pa.string()).take(encoded.indices)
+
+    def __getstate__(self):
+        # Stats and memo are per run; only the index goes into the pickle
+        state = self.__dict__.copy()
+        state["stats"] = Counter()
+        state["_memo"] = {}
+        return state
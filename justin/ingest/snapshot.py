@@ -0,0 +1,184 @@
+"""Pre-rendered export snapshots, written by the loaders after each load.
+
+When EXPORT_SNAPSHOT_DIR is set, every successful `python -m justin.ingest`
+run writes the export of each year, with and without growing_season, as
+immutable files for the export service to serve without Postgres:
+
+    <dir>/v<data_version>/manifest.json
+    <dir>/v<data_version>/header.csv.gz
+    <dir>/v<data_version>/<full|growing_season>/<year>.csv.gz  (no header)
+    <dir>/v<data_version>/<full|growing_season>/<year>.parquet
+    <dir>/v<data_version>/<full|growing_season>/all.csv.gz     (with header)
+    <dir>/v<data_version>/<full|growing_season>/all.parquet
+
+The .csv.gz files are single gzip members, so a year range is the header
+followed by its year files. A version is written to a temporary directory
+and renamed into place, so readers only ever see complete snapshots. The
+previous version is kept for responses still streaming from it.
+
+    python -m justin.ingest.snapshot [--dir DIR]    # rewrite for the current data
+"""
+
+import os
+import json
+import gzip
+import time
+import shutil
+import argparse
+
+from .db import get_connection
+
+SNAPSHOT_DIR = os.getenv("EXPORT_SNAPSHOT_DIR")
+
+# season -> (precip column, tavg column), as chosen by the export endpoint
+SEASONS = {
+    "full": ("precip_full", "tavg_full"),
+    "growing_season": ("precip_growing", "tavg_growing"),
+}
+
+def export_query(season):
+    # Same columns as the endpoint's export query, one year at a time
+    precip_col, tavg_col = SEASONS[season]
+    return f"""
+        SELECT
+            geofips,
+            county_name,
+            state,
+            year,
+            {precip_col} as precip_mm_total,
+            {tavg_col} as tavg_c,
+            soybean_total_production,
+            total_gdp
+        FROM soybean_data_view
+        WHERE year = %s
+    """
+
+def parquet_schema():
+    # Matches EXPORT_SCHEMA in justin/endpoint/formats.py
+    import pyarrow as pa
+    return pa.schema([
+        ("geofips", pa.string()),
+        ("county_name", pa.string()),
+        ("state", pa.string()),
+        ("year", pa.int32()),
+        ("precip_mm_total", pa.float64()),
+        ("tavg_c", pa.float64()),
+        ("soybean_total_production", pa.float64()),
+        ("total_gdp", pa.float64()),
+    ])
+
+def write_csv(cursor, query, path, header=False):
+    # COPY renders the values exactly as the endpoint's COPY stream does
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv{', HEADER' if header else ''})", f)
+
+def write_parquet(cursor, query, path, schema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    cursor.execute(query)
+    columns = list(zip(*cursor.fetchall())) or [[] for _ in schema]
+    table = pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema)
+    pq.write_table(table, path, compression="zstd")
+    return table
+
+def write_season(cursor, season, years, directory, schema):
+    os.makedirs(directory)
+    combined = None
+    if schema is not None:
+        import pyarrow.parquet as pq
+        # One row group per year
+        combined = pq.ParquetWriter(os.path.join(directory, "all.parquet"), schema, compression="zstd")
+    for year in years:
+        query = cursor.mogrify(export_query(season), (year,)).decode()
+        write_csv(cursor, query, os.path.join(directory, f"{year}.csv.gz"))
+        if combined is not None:
+            combined.write_table(write_parquet(cursor, query, os.path.join(directory, f"{year}.parquet"), schema))
+    if combined is not None:
+        combined.close()
+
+    with open(os.path.join(directory, "all.csv.gz"), "wb") as out:
+        for name in ["../header.csv.gz"] + [f"{year}.csv.gz" for year in years]:
+            with open(os.path.join(directory, name), "rb") as f:
+                shutil.copyfileobj(f, out)
+
+def write_snapshots(conn, directory=SNAPSHOT_DIR):
+    """Write the snapshot for the current data_version; returns its path or None.
+
+    Call it with no uncommitted work on `conn`: every query of a snapshot
+    runs in one REPEATABLE READ, READ ONLY transaction, so a load that
+    commits meanwhile cannot leave one version with years from two states.
+    """
+    if not directory:
+        return None
+    conn.rollback()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT version FROM data_version")
+        version = cursor.fetchone()[0]
+        final = os.path.join(directory, f"v{version}")
+        if os.path.exists(os.path.join(final, "manifest.json")):
+            return final
+        write_version(cursor, version, directory, final)
+    finally:
+        # The snapshot queries only read; end their transaction
+        conn.rollback()
+
+    prune(directory)
+    return final
+
+def write_version(cursor, version, directory, final):
+    try:
+        schema = parquet_schema()
+    except ImportError:
+        print("pyarrow is not installed; writing CSV snapshots only.")
+        schema = None
+
+    start = time.monotonic()
+    cursor.execute("SELECT DISTINCT year FROM soybean_data_view ORDER BY year")
+    years = [row[0] for row in cursor.fetchall()]
+
+    tmp = os.path.join(directory, f".v{version}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        # year = NULL matches nothing, leaving just the header line
+        header = cursor.mogrify(export_query("full"), (None,)).decode()
+        write_csv(cursor, header, os.path.join(tmp, "header.csv.gz"), header=True)
+        for season in SEASONS:
+            write_season(cursor, season, years, os.path.join(tmp, season), schema)
+        manifest = {
+            "version": version,
+            "years": years,
+            "formats": ["csv.gz", "parquet"] if schema is not None else ["csv.gz"],
+            "written_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    print(f"Wrote export snapshot v{version} ({len(years)} years) to {final} in {time.monotonic() - start:.1f}s.")
+
+def prune(directory, keep=2):
+    """Remove all but the newest `keep` snapshots."""
+    versions = sorted(int(name[1:]) for name in os.listdir(directory) if name.startswith("v") and name[1:].isdigit())
+    for version in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, f"v{version}"), ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m justin.ingest.snapshot", description="Write export snapshots for the current data.")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="Snapshot directory (default: $EXPORT_SNAPSHOT_DIR)")
+    args = parser.parse_args(argv)
+    if not args.dir:
+        parser.error("set EXPORT_SNAPSHOT_DIR or pass --dir")
+
+    conn = get_connection()
+    try:
+        write_snapshots(conn, args.dir)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import io
+import psycopg2.extras
+
+BACKENDS = ("copy", "values")
+
+def copy_value(val):
+    if val is None:
+        return "\\N"
+    if isinstance(val, float):
+        return repr(val)
+    if isinstance(val, str):
+        return val.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return str(val)
+
+def create_stage(cursor, table, columns, stage, temporary=True):
+    """Create a staging table shaped like `columns` of `table` plus stage_seq.
+
+    Temporary stages belong to one session and vanish on commit; shared
+    stages are UNLOGGED tables other connections can COPY into.
+    """
+    cols = ", ".join(columns)
+    kind = "TEMP" if temporary else "UNLOGGED"
+    on_commit = "ON COMMIT DROP" if temporary else ""
+    cursor.execute(f"""
+        CREATE {kind} TABLE {stage} {on_commit} AS
+        SELECT {cols} FROM {table} WITH NO DATA
+    """)
+    cursor.execute(f"ALTER TABLE {stage} ADD COLUMN stage_seq BIGINT")
+
+class UpsertWriter:
+    """Batched upsert into `table`, keyed on the `key` columns.
+
+    The "copy" backend streams batches through COPY into a session temp table
+    and merges everything with one set-based upsert in `close()`. The "values"
+    backend upserts each batch with execute_values as it fills up. Both keep
+    "last row wins" semantics when the same key is written more than once.
+
+    Passing `stage` makes the copy backend write into an existing shared
+    staging table instead of its own temp table; `seq_offset` then keeps the
+    stage_seq values of concurrent writers apart.
+
+    New rows are inserted in `order` (default: `key`) order, so a table can
+    be laid out the way its BRIN indexes expect.
+
+    Rows identical to what the table already holds are never rewritten. With
+    `checksums`, the copy backend also compares a checksum of each
+    county_year's staged rows against load_checksum and leaves county_years
+    whose rows have not changed since the last load out of the merge
+    entirely; `changed` then lists the county_year ids that were merged.
+    """
+
+    def __init__(self, cursor, table, columns, key, backend="copy", batch_size=10000, stage=None, seq_offset=0, checksums=False, order=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        self.cursor = cursor
+        self.table = table
+        self.columns = list(columns)
+        self.key = list(key)
+        self.order = list(order or key)
+        self.backend = backend
+        self.batch_size = batch_size
+        self.stage = stage or f"{table}_stage"
+        self.seq_offset = seq_offset
+        self.written = 0
+        self.inserted = 0
+        self.updated = 0
+        self.checksums = checksums
+        self.changed = None
+        self._batch = []
+        self._staged = stage is not None
+        self._is_partitioned = None
+
+    def _upsert_sql(self, source):
+        cols = ", ".join(self.columns)
+        key = ", ".join(self.key)
+        updates = [c for c in self.columns if c not in self.key]
+        if updates:
+            # Skip no-op updates: they would still write a new row version
+            action = (
+                "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in updates)
+                + f" WHERE ({', '.join(f't.{c}' for c in updates)})"
+                + f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in updates)})"
+            )
+        else:
+            action = "DO NOTHING"
+        if not self._partitioned():
+            # xmax is 0 only for rows this statement inserted
+            return f"""
+                WITH merged AS (
+                    INSERT INTO {self.table} AS t ({cols})
+                    {source}
+                    ON CONFLICT ({key}) {action}
+                    RETURNING t.xmax = 0 AS inserted
+                )
+                SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+                FROM merged
+            """
+        # Partitioned tables cannot return xmax, so look each merged key up
+        # once: the outer query still sees the snapshot from before the INSERT.
+        on_key = " AND ".join(f"before.{c} = m.{c}" for c in self.key)
+        return f"""
+            WITH merged AS (
+                INSERT INTO {self.table} AS t ({cols})
+                {source}
+                ON CONFLICT ({key}) {action}
+                RETURNING {key}
+            )
+            SELECT COUNT(*) FILTER (WHERE before.{self.key[0]} IS NULL), COUNT(before.{self.key[0]})
+            FROM merged m
+            LEFT JOIN {self.table} before ON {on_key}
+        """
+
+    def _partitioned(self):
+        if self._is_partitioned is None:
+            self.cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (self.table,))
+            self._is_partitioned = self.cursor.fetchone()[0]
+        return self._is_partitioned
+
+    def _count(self, row):
+        if row:
+            self.inserted += row[0] or 0
+            self.updated += row[1] or 0
+
+    def add(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def add_batch(self, batch):
+        """Stage an Arrow table or record batch with `columns`, in order (copy backend only).
+
+        The batch goes to COPY as CSV written by pyarrow, so no Python object
+        is created per row.
+        """
+        import pyarrow as pa
+        import pyarrow.csv as pv
+        if self.backend != "copy":
+            raise ValueError("add_batch requires the copy backend")
+        # Keep stage_seq in arrival order with rows added one at a time
+        self.flush()
+        if not batch.num_rows:
+            return
+        self._ensure_stage()
+        start = self.seq_offset + self.written
+        table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+        table = table.append_column("stage_seq", pa.array(range(start, start + table.num_rows), pa.int64()))
+        buffer = io.BytesIO()
+        pv.write_csv(table, buffer, pv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        cols = ", ".join(self.columns)
+        self.cursor.copy_expert(f"COPY {self.stage} ({cols}, stage_seq) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.written += table.num_rows
+
+    def flush(self):
+        if not self._batch:
+            return
+        if self.backend == "copy":
+            self._flush_copy()
+        else:
+            self._flush_values()
+        self.written += len(self._batch)
+        self._batch = []
+
+    def _ensure_stage(self):
+        if not self._staged:
+            create_stage(self.cursor, self.table, self.columns, self.stage)
+            self._staged = True
+
+    def _flush_copy(self):
+        self._ensure_stage()
+        buffer = io.StringIO()
+        for seq, row in enumerate(self._batch, start=self.seq_offset + self.written):
+            buffer.write("\t".join(copy_value(v) for v in row))
+            buffer.write(f"\t{seq}\n")
+        buffer.seek(0)
+        cols = ", ".join(self.columns)
+        self.cursor.copy_expert(f"COPY {self.stage} ({cols}, stage_seq) FROM STDIN", buffer)
+
+    def _flush_values(self):
+        # ON CONFLICT cannot touch the same row twice in one statement
+        key_idx = [self.columns.index(c) for c in self.key]
+        unique = {}
+        for row in self._batch:
+            unique[tuple(row[i] for i in key_idx)] = row
+        rows = list(unique.values())
+        if self.order != self.key:
+            order_idx = [self.columns.index(c) for c in self.order]
+            rows.sort(key=lambda row: tuple(row[i] for i in order_idx))
+        if self.checksums:
+            # Rows written here bypass the checksums, so forget the old ones
+            cy_idx = self.columns.index("county_year_id")
+            self.cursor.execute(
+                "DELETE FROM load_checksum WHERE table_name = %s AND county_year_id = ANY(%s)",
+                (self.table, sorted({row[cy_idx] for row in rows}))
+            )
+        sql = self._upsert_sql("VALUES %s")
+        # Each page is its own statement, so sum the per-page counts
+        for page in psycopg2.extras.execute_values(
+            self.cursor, sql, rows, page_size=self.batch_size, fetch=True
+        ):
+            self._count(page)
+
+    def _latest(self, where="", ordered=False):
+        cols = ", ".join(self.columns)
+        key = ", ".join(self.key)
+        latest = f"""
+            SELECT DISTINCT ON ({key}) {cols}
+            FROM {self.stage}
+            {where}
+            ORDER BY {key}, stage_seq DESC
+        """
+        if not ordered or self.order == self.key:
+            return latest
+        # INSERT ... SELECT writes new rows in the order the SELECT returns them
+        return f"SELECT * FROM ({latest}) latest ORDER BY {', '.join(self.order)}"
+
+    def merge(self):
+        """Upsert the staging table into the target, newest row per key."""
+        if not self.checksums:
+            self.cursor.execute(self._upsert_sql(self._latest(ordered=True)))
+            self._count(self.cursor.fetchone())
+            return
+
+        sums = f"{self.stage}_sums"
+        key = ", ".join(self.key)
+        self.cursor.execute(f"""
+            CREATE TEMP TABLE {sums} ON COMMIT DROP AS
+            SELECT s.county_year_id, md5(string_agg(s::text, E'\\n' ORDER BY {key})) AS checksum
+            FROM ({self._latest()}) s
+            GROUP BY s.county_year_id
+        """)
+        self.cursor.execute(f"""
+            DELETE FROM {sums} c
+            USING load_checksum l
+            WHERE l.table_name = %s AND l.county_year_id = c.county_year_id AND l.checksum = c.checksum
+        """, (self.table,))
+
+        self.cursor.execute(self._upsert_sql(
+            self._latest(f"WHERE county_year_id IN (SELECT county_year_id FROM {sums})", ordered=True)
+        ))
+        self._count(self.cursor.fetchone())
+
+        self.cursor.execute(f"""
+            INSERT INTO load_checksum (table_name, county_year_id, checksum)
+            SELECT %s, county_year_id, checksum FROM {sums}
+            ON CONFLICT (table_name, county_year_id) DO UPDATE SET checksum = EXCLUDED.checksum
+            RETURNING county_year_id
+        """, (self.table,))
+        self.changed = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute(f"DROP TABLE {sums}")
+
+    def close(self, merge=True):
+        """Flush what is left and, for COPY, merge the staging table."""
+        self.flush()
+        if merge and self.backend == "copy":
+            if self._staged:
+                self.merge()
+            elif self.checksums:
+                # Nothing was staged, so no county_year changed
+                self.changed = []
+        return self.inserted, self.updated
@@ -12,17 +12,23 @@ CREATE TABLE county_year (
     UNIQUE(county_id, year)
 );
 
+-- Daily weather, range-partitioned by calendar year (weather_YYYY). Loaders
+-- create missing partitions before writing (ensure_weather_partitions in
+-- justin/ingest/db.py), so queries with a date range only scan those years.
+-- Existing unpartitioned databases: python -m justin.ingest.partition
 CREATE TABLE weather (
-    id SERIAL PRIMARY KEY,
-    county_year_id INTEGER REFERENCES county_year(id) ON DELETE CASCADE,
+    county_year_id INTEGER NOT NULL REFERENCES county_year(id) ON DELETE CASCADE,
     date DATE NOT NULL,
     month INTEGER GENERATED ALWAYS AS (EXTRACT(MONTH FROM date)) STORED,
     precip_mm DOUBLE PRECISION,
     tavg_c DOUBLE PRECISION,
     tmax_c DOUBLE PRECISION,
     tmin_c DOUBLE PRECISION,
-    UNIQUE(county_year_id, date)
-);
+    PRIMARY KEY (county_year_id, date)
+) PARTITION BY RANGE (date);
+
+-- autosummarize: ranges filled by a load are summarized without waiting for VACUUM
+CREATE INDEX weather_date_brin ON weather USING BRIN (date) WITH (autosummarize = on);
 
 CREATE TABLE agricultural (
     id SERIAL PRIMARY KEY,
@@ -40,26 +46,315 @@ CREATE TABLE economy (
     UNIQUE(county_year_id)
 );
 
-CREATE OR REPLACE VIEW soybean_data_view AS
-WITH weather_full AS (
-    SELECT 
-        county_year_id,
-        SUM(precip_mm) as precip_mm_total,
-        AVG(tavg_c) as tavg_c,
-        COUNT(*) as day_count
-    FROM weather
-    GROUP BY county_year_id
-),
-weather_growing AS (
-    SELECT 
+-- NASS Quick Stats facts for any commodity. Commodity and data item strings
+-- are stored once in the dimension tables; nass_value holds small ids.
+CREATE TABLE nass_commodity (
+    id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE nass_item (
+    id SERIAL PRIMARY KEY,
+    commodity_id SMALLINT NOT NULL REFERENCES nass_commodity(id),
+    program TEXT NOT NULL,
+    period TEXT NOT NULL,
+    data_item TEXT NOT NULL,
+    domain_category TEXT NOT NULL,
+    UNIQUE(commodity_id, program, period, data_item, domain_category)
+);
+
+-- geofips is the county FIPS, or SS000 for state-level rows
+CREATE TABLE nass_value (
+    item_id INTEGER NOT NULL REFERENCES nass_item(id),
+    geofips VARCHAR(10) NOT NULL,
+    year INTEGER NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    cv_pct DOUBLE PRECISION,
+    PRIMARY KEY (item_id, geofips, year)
+);
+
+CREATE INDEX nass_value_item_year_idx ON nass_value (item_id, year);
+CREATE INDEX nass_value_geofips_year_idx ON nass_value (geofips, year);
+
+CREATE OR REPLACE VIEW nass_series_view AS
+SELECT
+    c.name AS commodity,
+    i.program,
+    i.period,
+    i.data_item,
+    i.domain_category,
+    v.geofips,
+    v.year,
+    v.value,
+    v.cv_pct
+FROM nass_value v
+JOIN nass_item i ON v.item_id = i.id
+JOIN nass_commodity c ON i.commodity_id = c.id;
+
+-- BEA regional tables (SASUMMARY, SAGDP*, CAGDP*, ...) in long format, all
+-- lines and industries. A line is one row of a BEA table; its description
+-- and unit are stored once here.
+CREATE TABLE bea_line (
+    id SERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    line_code INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    industry_classification TEXT,
+    unit TEXT,
+    UNIQUE(table_name, line_code)
+);
+
+-- geofips is the county FIPS, SS000 for states or 00000 for the US. Cells
+-- BEA withholds or has not published have a NULL value and BEA's code in
+-- note: D (disclosure), NA, NM (not meaningful), L (under $50k), ...
+CREATE TABLE bea_value (
+    line_id INTEGER NOT NULL REFERENCES bea_line(id),
+    geofips VARCHAR(10) NOT NULL,
+    year INTEGER NOT NULL,
+    value DOUBLE PRECISION,
+    note VARCHAR(8),
+    PRIMARY KEY (line_id, geofips, year)
+);
+
+CREATE INDEX bea_value_geofips_year_idx ON bea_value (geofips, year);
+
+CREATE OR REPLACE VIEW bea_series_view AS
+SELECT
+    l.table_name,
+    l.line_code,
+    l.description,
+    l.industry_classification,
+    l.unit,
+    v.geofips,
+    v.year,
+    v.value,
+    v.note
+FROM bea_value v
+JOIN bea_line l ON v.line_id = l.id;
+
+-- Single-row stamp bumped by every loader commit; the export service uses it
+-- to invalidate cached responses.
+CREATE TABLE data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO data_version (version) VALUES (1);
+
+-- One row per source file a loader has read: re-runs skip files whose size,
+-- mtime or hash still match, and resume appended CSVs from last_position.
+CREATE TABLE load_ledger (
+    dataset VARCHAR(32) NOT NULL,
+    source TEXT NOT NULL,
+    file_size BIGINT NOT NULL,
+    file_mtime_ns BIGINT NOT NULL,
+    file_hash CHAR(64) NOT NULL,
+    last_position BIGINT NOT NULL,
+    -- ledger.reference_state() after the load; a change forces a full reread
+    reference_state TEXT,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (dataset, source)
+);
+
+-- Checksum of the rows last merged into `table_name` for each county_year;
+-- county_years whose staged rows hash the same are left out of the merge.
+CREATE TABLE load_checksum (
+    table_name VARCHAR(32) NOT NULL,
+    county_year_id INTEGER NOT NULL REFERENCES county_year(id) ON DELETE CASCADE,
+    checksum CHAR(32) NOT NULL,
+    PRIMARY KEY (table_name, county_year_id)
+);
+
+-- Per county-year weather rollup behind soybean_data_view. Loaders keep it
+-- current by calling refresh_weather_summary() with the county_year ids they
+-- touched, so exports never aggregate the daily weather table.
+CREATE TABLE weather_summary (
+    county_year_id INTEGER PRIMARY KEY REFERENCES county_year(id) ON DELETE CASCADE,
+    precip_full DOUBLE PRECISION,
+    tavg_full DOUBLE PRECISION,
+    days_full INTEGER NOT NULL,
+    precip_growing DOUBLE PRECISION,
+    tavg_growing DOUBLE PRECISION,
+    days_growing INTEGER NOT NULL
+);
+
+-- Backfill an existing database with:
+--   SELECT refresh_weather_summary(ARRAY(SELECT DISTINCT county_year_id FROM weather));
+CREATE OR REPLACE FUNCTION refresh_weather_summary(ids INTEGER[]) RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+    first_day DATE;
+    end_day DATE;
+BEGIN
+    -- Bound the date range by the ids' years so only those weather
+    -- partitions are scanned
+    SELECT make_date(MIN(year), 1, 1), make_date(MAX(year) + 1, 1, 1)
+    INTO first_day, end_day
+    FROM county_year WHERE id = ANY(ids);
+
+    DELETE FROM weather_summary ws
+    WHERE ws.county_year_id = ANY(ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM weather w
+          WHERE w.county_year_id = ws.county_year_id AND w.date >= first_day AND w.date < end_day
+      );
+
+    INSERT INTO weather_summary (
+        county_year_id, precip_full, tavg_full, days_full,
+        precip_growing, tavg_growing, days_growing
+    )
+    SELECT
         county_year_id,
-        SUM(precip_mm) as precip_mm_total,
-        AVG(tavg_c) as tavg_c,
-        COUNT(*) as day_count
+        SUM(precip_mm),
+        AVG(tavg_c),
+        COUNT(*),
+        SUM(precip_mm) FILTER (WHERE month BETWEEN 5 AND 9),
+        AVG(tavg_c) FILTER (WHERE month BETWEEN 5 AND 9),
+        COUNT(*) FILTER (WHERE month BETWEEN 5 AND 9)
     FROM weather
-    WHERE EXTRACT(MONTH FROM date) BETWEEN 5 AND 9
+    WHERE county_year_id = ANY(ids) AND date >= first_day AND date < end_day
     GROUP BY county_year_id
-)
+    ON CONFLICT (county_year_id) DO UPDATE SET
+        precip_full = EXCLUDED.precip_full,
+        tavg_full = EXCLUDED.tavg_full,
+        days_full = EXCLUDED.days_full,
+        precip_growing = EXCLUDED.precip_growing,
+        tavg_growing = EXCLUDED.tavg_growing,
+        days_growing = EXCLUDED.days_growing;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Per county-year weather features for yield models, derived from the daily
+-- rows by refresh_weather_features() alongside weather_summary:
+--   gdd_*          growing degree days, base 10 °C with temperatures capped
+--                  at 30 °C: (min(tmax, 30) + max(tmin, 10)) / 2 - 10 per day
+--   heat_days_*    days with tmax above 30 °C
+--   dry_spell_growing  longest run of consecutive May-Sep days under 1 mm
+--   precip_<month> monthly precipitation totals (mm)
+-- "growing" is May-Sep, as in weather_summary.
+CREATE TABLE weather_features (
+    county_year_id INTEGER PRIMARY KEY REFERENCES county_year(id) ON DELETE CASCADE,
+    gdd_full DOUBLE PRECISION,
+    gdd_growing DOUBLE PRECISION,
+    heat_days_full INTEGER NOT NULL,
+    heat_days_growing INTEGER NOT NULL,
+    dry_spell_growing INTEGER NOT NULL,
+    precip_jan DOUBLE PRECISION,
+    precip_feb DOUBLE PRECISION,
+    precip_mar DOUBLE PRECISION,
+    precip_apr DOUBLE PRECISION,
+    precip_may DOUBLE PRECISION,
+    precip_jun DOUBLE PRECISION,
+    precip_jul DOUBLE PRECISION,
+    precip_aug DOUBLE PRECISION,
+    precip_sep DOUBLE PRECISION,
+    precip_oct DOUBLE PRECISION,
+    precip_nov DOUBLE PRECISION,
+    precip_dec DOUBLE PRECISION
+);
+
+-- Backfill an existing database with:
+--   SELECT refresh_weather_features(ARRAY(SELECT county_year_id FROM weather_summary));
+CREATE OR REPLACE FUNCTION refresh_weather_features(ids INTEGER[]) RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+    first_day DATE;
+    end_day DATE;
+BEGIN
+    SELECT make_date(MIN(year), 1, 1), make_date(MAX(year) + 1, 1, 1)
+    INTO first_day, end_day
+    FROM county_year WHERE id = ANY(ids);
+
+    DELETE FROM weather_features wf
+    WHERE wf.county_year_id = ANY(ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM weather w
+          WHERE w.county_year_id = wf.county_year_id AND w.date >= first_day AND w.date < end_day
+      );
+
+    -- One scan of the daily rows: "days" is materialized and read by both
+    -- the dry-spell runs and the aggregates
+    WITH days AS MATERIALIZED (
+        SELECT
+            county_year_id,
+            date,
+            month,
+            precip_mm,
+            tmax_c,
+            GREATEST((LEAST(tmax_c, 30) + GREATEST(LEAST(tmin_c, 30), 10)) / 2 - 10, 0) AS gdd
+        FROM weather
+        WHERE county_year_id = ANY(ids) AND date >= first_day AND date < end_day
+    ),
+    -- Consecutive dry days share date - row_number() (gaps and islands)
+    spells AS (
+        SELECT county_year_id, MAX(days) AS longest
+        FROM (
+            SELECT county_year_id, COUNT(*) AS days
+            FROM (
+                SELECT county_year_id, date - ROW_NUMBER() OVER (PARTITION BY county_year_id ORDER BY date)::int AS run
+                FROM days
+                WHERE month BETWEEN 5 AND 9 AND precip_mm < 1
+            ) dry
+            GROUP BY county_year_id, run
+        ) runs
+        GROUP BY county_year_id
+    )
+    INSERT INTO weather_features (
+        county_year_id, gdd_full, gdd_growing, heat_days_full, heat_days_growing, dry_spell_growing,
+        precip_jan, precip_feb, precip_mar, precip_apr, precip_may, precip_jun,
+        precip_jul, precip_aug, precip_sep, precip_oct, precip_nov, precip_dec
+    )
+    SELECT
+        d.county_year_id,
+        SUM(gdd),
+        SUM(gdd) FILTER (WHERE month BETWEEN 5 AND 9),
+        COUNT(*) FILTER (WHERE tmax_c > 30),
+        COUNT(*) FILTER (WHERE tmax_c > 30 AND month BETWEEN 5 AND 9),
+        COALESCE(s.longest, 0),
+        SUM(precip_mm) FILTER (WHERE month = 1),
+        SUM(precip_mm) FILTER (WHERE month = 2),
+        SUM(precip_mm) FILTER (WHERE month = 3),
+        SUM(precip_mm) FILTER (WHERE month = 4),
+        SUM(precip_mm) FILTER (WHERE month = 5),
+        SUM(precip_mm) FILTER (WHERE month = 6),
+        SUM(precip_mm) FILTER (WHERE month = 7),
+        SUM(precip_mm) FILTER (WHERE month = 8),
+        SUM(precip_mm) FILTER (WHERE month = 9),
+        SUM(precip_mm) FILTER (WHERE month = 10),
+        SUM(precip_mm) FILTER (WHERE month = 11),
+        SUM(precip_mm) FILTER (WHERE month = 12)
+    FROM days d
+    LEFT JOIN spells s ON s.county_year_id = d.county_year_id
+    GROUP BY d.county_year_id, s.longest
+    ON CONFLICT (county_year_id) DO UPDATE SET
+        gdd_full = EXCLUDED.gdd_full,
+        gdd_growing = EXCLUDED.gdd_growing,
+        heat_days_full = EXCLUDED.heat_days_full,
+        heat_days_growing = EXCLUDED.heat_days_growing,
+        dry_spell_growing = EXCLUDED.dry_spell_growing,
+        precip_jan = EXCLUDED.precip_jan,
+        precip_feb = EXCLUDED.precip_feb,
+        precip_mar = EXCLUDED.precip_mar,
+        precip_apr = EXCLUDED.precip_apr,
+        precip_may = EXCLUDED.precip_may,
+        precip_jun = EXCLUDED.precip_jun,
+        precip_jul = EXCLUDED.precip_jul,
+        precip_aug = EXCLUDED.precip_aug,
+        precip_sep = EXCLUDED.precip_sep,
+        precip_oct = EXCLUDED.precip_oct,
+        precip_nov = EXCLUDED.precip_nov,
+        precip_dec = EXCLUDED.precip_dec;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE VIEW soybean_data_view AS
 SELECT 
     c.geofips,
     c.name as county_name,
@@ -67,16 +362,17 @@ SELECT
     cy.year,
     a.soybean_total_production,
     e.total_gdp,
-    wf.precip_mm_total as precip_full,
-    wf.tavg_c as tavg_full,
-    wf.day_count as days_full,
-    wg.precip_mm_total as precip_growing,
-    wg.tavg_c as tavg_growing,
-    wg.day_count as days_growing
+    ws.precip_full,
+    ws.tavg_full,
+    ws.days_full,
+    ws.precip_growing,
+    ws.tavg_growing,
+    ws.days_growing,
+    cy.id AS county_year_id
 FROM county_year cy
 JOIN county c ON cy.county_id = c.geofips
 JOIN agricultural a ON cy.id = a.county_year_id
 JOIN economy e ON cy.id = e.county_year_id
-JOIN weather_full wf ON cy.id = wf.county_year_id
-JOIN weather_growing wg ON cy.id = wg.county_year_id;
+JOIN weather_summary ws ON cy.id = ws.county_year_id
+WHERE ws.days_growing > 0;
 
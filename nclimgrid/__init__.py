@@ -0,0 +1,4 @@
+"""Tools for turning NOAA nClimGrid grids into per-region time series.
+
+See noaa_ds/info.md for where the grids and boundary files come from.
+"""
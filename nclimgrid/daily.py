@@ -0,0 +1,50 @@
+"""County-level daily weather from the nClimGrid-Daily monthly files.
+
+nClimGrid-Daily ships one NetCDF per month (ncdd-YYYYMM-grd-scaled.nc) holding
+prcp, tavg, tmax and tmin. Months are processed one file at a time, so only
+the requested date range is ever read.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from .zonal import ZoneIndex
+from .stream import VARIABLES, COLUMNS, iter_blocks
+
+DAILY_PATTERN = "ncdd-{month:%Y%m}-grd-scaled.nc"
+
+def month_starts(start, end):
+    return pd.date_range(pd.Timestamp(start).replace(day=1), pd.Timestamp(end), freq="MS")
+
+def iter_daily_rows(directory, zones, id_column, start, end, pattern=DAILY_PATTERN):
+    """Yield (zone id, date, prcp, tavg, tmax, tmin) for every zone and day.
+
+    Days in [start, end] are covered month by month; a month whose file is not
+    there yet (e.g. the current month on a nightly run) ends the walk, since
+    later months cannot exist either. NaN means come out as None, and
+    zone-days with no valid pixel in any variable are dropped.
+    """
+    zones = zones.to_crs("EPSG:4326")
+    ids = zones[id_column].to_numpy()
+    index = None
+
+    for month in month_starts(start, end):
+        path = os.path.join(directory, pattern.format(month=month))
+        if not os.path.exists(path):
+            print(f"No nClimGrid-Daily file for {month:%Y-%m} ({path}), stopping.")
+            return
+
+        with xr.open_dataset(path, cache=False) as ds:
+            grids = {var: ds[var] for var in VARIABLES}
+            if index is None:
+                # The grid is the same every month, so rasterize only once
+                index = ZoneIndex.for_grid(zones.geometry, ds[VARIABLES[0]])
+
+            for frame in iter_blocks(grids, index, ids, id_column, chunk=31, start=start, end=end):
+                values = frame[[COLUMNS[var] for var in VARIABLES]].to_numpy()
+                measures = np.where(np.isnan(values), None, values).tolist()
+                for zone_id, date, row in zip(frame[id_column], frame["date"], measures):
+                    if any(value is not None for value in row):
+                        yield (zone_id, date.date(), *row)
@@ -0,0 +1,105 @@
+"""Out-of-core zonal means for all four nClimGrid variables in one pass.
+
+Each variable file is opened lazily (nothing is cached on the dataset), and
+the time axis is walked in blocks of `chunk` steps: for every block, only that
+slice of prcp, tavg, tmax and tmin is read, reduced to per-zone means and
+written out before the next block is read. Peak memory is therefore about
+chunk * grid size * 4 variables, however long the record is.
+
+    python -m nclimgrid.stream noaa_ds/us_states --out noaa_ds/us_states_monthly.csv
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import xarray as xr
+import geopandas as gpd
+
+from .zonal import ZoneIndex, NODATA
+
+VARIABLES = ("prcp", "tavg", "tmax", "tmin")
+
+# Output column for each variable, matching the weather table's units
+COLUMNS = {"prcp": "precip_mm", "tavg": "tavg_c", "tmax": "tmax_c", "tmin": "tmin_c"}
+
+DEFAULT_CHUNK = 12
+
+def default_paths(directory="noaa_ds"):
+    return {var: os.path.join(directory, f"nclimgrid_{var}.nc") for var in VARIABLES}
+
+def open_grids(paths):
+    """Open each variable lazily; returns {var: DataArray} sharing one time axis."""
+    grids = {}
+    for var, path in paths.items():
+        ds = xr.open_dataset(path, cache=False)
+        grids[var] = ds[var]
+
+    first = next(iter(grids.values()))
+    for var, grid in grids.items():
+        if grid.sizes["time"] != first.sizes["time"] or not np.array_equal(grid["time"].values, first["time"].values):
+            raise ValueError(f"{var} does not share the time axis of the other variables")
+    return grids
+
+def iter_blocks(grids, index, names, name_column, chunk=DEFAULT_CHUNK, start=None, end=None):
+    """Yield one long DataFrame per block of time steps.
+
+    `start`/`end` (inclusive dates) restrict the walk to part of the record.
+    """
+    first = next(iter(grids.values()))
+    times = pd.to_datetime(first["time"].values)
+    lo = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start), side="left"))
+    hi = len(times) if end is None else int(np.searchsorted(times, pd.Timestamp(end), side="right"))
+
+    for offset in range(lo, hi, chunk):
+        block = slice(offset, min(offset + chunk, hi))
+        n = block.stop - block.start
+        frame = {
+            name_column: np.tile(names, n),
+            "date": np.repeat(times[block], len(names)),
+        }
+        for var, grid in grids.items():
+            # Only this block of this variable is in memory at any point
+            frame[COLUMNS[var]] = index.means(grid.isel(time=block).values, NODATA).ravel()
+        yield pd.DataFrame(frame)
+
+def process(paths, zones, name_column, out, chunk=DEFAULT_CHUNK, start=None, end=None):
+    grids = open_grids(paths)
+    try:
+        zones = zones.to_crs("EPSG:4326")
+        index = ZoneIndex.for_grid(zones.geometry, next(iter(grids.values())))
+        names = zones[name_column].to_numpy()
+
+        rows = 0
+        with open(out, "w", newline="") as f:
+            for i, frame in enumerate(iter_blocks(grids, index, names, name_column, chunk, start, end)):
+                frame.to_csv(f, header=(i == 0), index=False)
+                rows += len(frame)
+        return rows
+    finally:
+        for grid in grids.values():
+            grid.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nclimgrid.stream", description="Zonal means of all nClimGrid variables in one streaming pass.")
+    parser.add_argument("zones", help="Polygon file or directory readable by geopandas")
+    parser.add_argument("--out", required=True, help="Output CSV")
+    parser.add_argument("--dir", default="noaa_ds", help="Directory holding nclimgrid_<var>.nc files")
+    for var in VARIABLES:
+        parser.add_argument(f"--{var}", help=f"Path to the {var} file (default: <dir>/nclimgrid_{var}.nc)")
+    parser.add_argument("--name-column", default="NAME", help="Zone name column in the polygon file")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="Time steps per block")
+    parser.add_argument("--start", help="First date to process (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date to process (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    paths = default_paths(args.dir)
+    for var in VARIABLES:
+        if getattr(args, var):
+            paths[var] = getattr(args, var)
+
+    rows = process(paths, gpd.read_file(args.zones), args.name_column, args.out, args.chunk, args.start, args.end)
+    print(f"Wrote {rows} rows to {args.out}")
+
+if __name__ == "__main__":
+    main()
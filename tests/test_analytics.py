@@ -0,0 +1,33 @@
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "justin", "endpoint"))
+
+import main
+from analytics import ANALYTICS_SCHEMA, aggregate, filter_table
+from psycopg_pool import PoolTimeout
+
+def test_ungrouped_aggregate_of_no_rows_is_one_row():
+    table = filter_table(ANALYTICS_SCHEMA.empty_table(), start=3000)
+    rows = aggregate(table, "soybean_total_production", [], ["mean", "count"])
+    assert rows == [{"soybean_total_production_mean": None, "soybean_total_production_count": 0}]
+    assert aggregate(table, "soybean_total_production", ["state"], ["count"]) == []
+
+class BusyAnalytics:
+    version = None
+
+    async def get(self, pool, version):
+        raise PoolTimeout("no connection free")
+
+def test_analytics_pool_timeout_is_503():
+    state = SimpleNamespace(analytics=BusyAnalytics(), pool=None, cache=SimpleNamespace(version=1))
+    request = SimpleNamespace(app=SimpleNamespace(state=state))
+    response = asyncio.run(main.analytics_aggregate(
+        request, metric="soybean_total_production", group_by=None, aggregates="count",
+        start=None, end=None, states=None, counties=None,
+    ))
+    assert response.status_code == 503
+    assert json.loads(response.body) == {"detail": "Database busy, try again later"}
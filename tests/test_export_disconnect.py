@@ -0,0 +1,80 @@
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "justin", "endpoint"))
+
+import main
+from export_cache import ExportCache
+
+class FakeCopy:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        self.events.append("copy open")
+        return self
+
+    async def __aexit__(self, *exc):
+        self.events.append("copy closed")
+
+    async def __aiter__(self):
+        while True:
+            await asyncio.sleep(0)
+            yield os.urandom(16 * 1024)
+
+class FakeCursor:
+    def __init__(self, events):
+        self.events = events
+
+    def copy(self, statement, params):
+        return FakeCopy(self.events)
+
+class FakeConn:
+    def __init__(self, events):
+        self.events = events
+
+    def cursor(self):
+        return FakeCursor(self.events)
+
+class FakePool:
+    def __init__(self, events):
+        self.events = events
+
+    async def getconn(self):
+        return FakeConn(self.events)
+
+    async def putconn(self, conn):
+        self.events.append("putconn")
+
+async def disconnect_after_first_chunk(fmt):
+    events = []
+    body = main.stream_export(FakePool(events), FakeConn(events), fmt, "SELECT 1", {})
+    await anext(body)
+    # What the server does with the body once the client has gone away
+    await body.aclose()
+    return events
+
+def test_disconnect_closes_copy_before_returning_connection():
+    for fmt in ("csv", "csv.gz"):
+        assert asyncio.run(disconnect_after_first_chunk(fmt)) == ["copy open", "copy closed", "putconn"]
+
+async def disconnect_from_export(fmt):
+    events = []
+    cache = ExportCache(1 << 20, 1 << 20)
+    cache.set_version(1)
+    state = SimpleNamespace(pool=FakePool(events), cache=cache, snapshots=None, background=set(), slow_queries=[])
+    request = SimpleNamespace(app=SimpleNamespace(state=state), headers={})
+    response = await main.export(request, start=None, end=None, growing_season=False, features=False, format=fmt)
+    body = response.body_iterator
+    await anext(body)
+    await body.aclose()
+    # Copied before asyncio.run's shutdown finalizes any generator left open
+    return list(events)
+
+def test_disconnect_closes_the_whole_export_body():
+    # The body export() returns wraps stream_export in tee_to_cache,
+    # prepend and observed; each has to pass the close down
+    for fmt in ("csv", "csv.gz"):
+        assert asyncio.run(disconnect_from_export(fmt)) == ["copy open", "copy closed", "putconn"]
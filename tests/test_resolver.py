@@ -0,0 +1,17 @@
+from justin.ingest.resolver import CountyResolver
+
+COUNTIES = [
+    ("01001", "Autauga", "Alabama"),
+    ("48453", "Travis", "Texas"),
+]
+
+def test_unknown_state_does_not_fall_back_to_any_state():
+    resolver = CountyResolver(COUNTIES)
+    for state in ("Guam", "Alabma"):
+        assert resolver._resolve(None, "Autauga", state) == (None, "unknown")
+
+def test_known_or_missing_state_still_resolves():
+    resolver = CountyResolver(COUNTIES)
+    assert resolver._resolve(None, "Autauga", "AL") == ("01001", "name")
+    assert resolver._resolve(None, "Autauga", None) == ("01001", "name")
+    assert resolver._resolve(None, "Autauga", " ") == ("01001", "name")
@@ -0,0 +1,44 @@
+from justin.ingest import batches
+from justin.ingest.resolver import CountyResolver
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchone(self):
+        return (0,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class FakeConn:
+    def __init__(self):
+        self.cur = FakeCursor()
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+def test_load_with_no_county_years_stages_nothing(monkeypatch, tmp_path):
+    # Weather loaded before agricultural has created any county_year rows
+    monkeypatch.setattr(batches.CountyResolver, "from_cursor", classmethod(lambda cls, cursor: CountyResolver([])))
+    monkeypatch.setattr(batches, "load_cy_ids", lambda cursor: {})
+    path = tmp_path / "weather.csv"
+    path.write_text("GeoFIPS,county,date,precip_mm,tavg_C,tmax_C,tmin_C\n01001,,2010-01-01,1.5,2.0,3.0,1.0\n")
+
+    conn = FakeConn()
+    batches.load_weather_batches(conn, str(path))
+
+    assert conn.commits == 1
+    refreshes = [params for sql, params in conn.cur.statements if "refresh_weather_summary" in sql]
+    assert refreshes == [([],)]
+    assert not any("data_version" in sql for sql, _ in conn.cur.statements)
@@ -0,0 +1,19 @@
+from justin.ingest import batches, datasets, parallel
+
+def record_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(batches, "load_weather_batches", lambda *args: calls.append(("batches", args)))
+    monkeypatch.setattr(parallel, "load_weather_parallel", lambda *args: calls.append(("parallel", args)))
+    return calls
+
+def test_compressed_weather_loads_serially(monkeypatch, capsys):
+    calls = record_calls(monkeypatch)
+    for path in ("weather.csv.gz", "weather.csv.zst"):
+        datasets.load_weather(None, path, workers=4)
+    assert [name for name, _ in calls] == ["batches", "batches"]
+    assert "loading it in a single process" in capsys.readouterr().out
+
+def test_plain_weather_still_loads_in_parallel(monkeypatch):
+    calls = record_calls(monkeypatch)
+    datasets.load_weather(None, "weather.csv", workers=4)
+    assert [name for name, _ in calls] == ["parallel"]